@@ -0,0 +1,170 @@
+import re
+from collections import Counter
+from collections import OrderedDict
+
+# common spellings mapped to a single abbreviation so differently written addresses normalize to the same tokens
+STREET_SUFFIXES = {
+    'street': 'st', 'str': 'st',
+    'avenue': 'ave', 'av': 'ave',
+    'boulevard': 'blvd', 'blv': 'blvd',
+    'road': 'rd',
+    'drive': 'dr',
+    'lane': 'ln',
+    'court': 'ct',
+    'place': 'pl',
+    'circle': 'cir',
+    'highway': 'hwy',
+    'station': 'sta',
+}
+DIRECTIONS = {
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+    'northeast': 'ne', 'northwest': 'nw', 'southeast': 'se', 'southwest': 'sw',
+}
+UNIT_DESIGNATORS = {'apt', 'apartment', 'suite', 'ste', 'unit', 'rm', 'room', 'fl', 'floor', 'bldg'}
+
+
+class AddressResolver:
+    """
+    Resolves free form addresses to known locations
+
+    Addresses are normalized (case, punctuation, street suffixes, directions, unit numbers) and indexed two ways:
+        by house number, which an address has to share with a location to be considered a match
+        by character trigrams of the street portion, which rank the candidates sharing a house number and shortlist
+        candidates for addresses without one
+
+    A lookup only scores the locations on its shortlist, so it scales with the number of candidates rather than the
+    number of known locations. Results, including misses, are memoized until a new location is added. The memo holds the
+    memo_size most recently resolved addresses, so resolving a stream of distinct addresses takes bounded memory.
+    """
+
+    def __init__(self, locations=(), threshold=0.4, memo_size=4096):
+        """
+        :param locations: locations to index
+        :param threshold: minimum trigram similarity of the street portion for a fuzzy match, between 0 and 1
+        :param memo_size: most resolved addresses remembered, least recently used are dropped first
+        """
+        self.threshold = threshold
+        self.memo_size = memo_size
+        self.exact = {}
+        self.normalized = {}
+        self.by_house_number = {}
+        self.by_trigram = {}
+        self.street_trigrams = {}
+        self.memo = OrderedDict()
+        for location in locations:
+            self.add_location(location)
+
+    @staticmethod
+    def normalize(address):
+        """
+        normalizes an address to lower case tokens with abbreviated suffixes and directions and no unit number
+        :param address: address to normalize
+        :return: a tuple of the house number (or None) and a tuple of the remaining street tokens
+        """
+        tokens = re.sub(r'[^a-z0-9# ]', ' ', address.lower()).split()
+        street_tokens = []
+        skip_next = False
+        for token in tokens:
+            if skip_next:
+                skip_next = False
+                continue
+            if token.startswith('#'):
+                # '#104' or '# 104'
+                skip_next = token == '#'
+                continue
+            if token in UNIT_DESIGNATORS:
+                skip_next = True
+                continue
+            street_tokens.append(DIRECTIONS.get(token, STREET_SUFFIXES.get(token, token)))
+        house_number = None
+        if street_tokens and street_tokens[0].isdigit():
+            house_number = street_tokens.pop(0)
+        return house_number, tuple(street_tokens)
+
+    @staticmethod
+    def trigrams(street_tokens):
+        """
+        :param street_tokens: normalized street tokens
+        :return: set of character trigrams of the padded street tokens
+        """
+        trigrams = set()
+        for token in street_tokens:
+            padded = ' %s ' % token
+            for i in range(len(padded) - 2):
+                trigrams.add(padded[i:i + 3])
+        return trigrams
+
+    def add_location(self, location):
+        """
+        adds a location to the index
+        :param location: location to add, its address is what gets indexed
+        :return: None
+        """
+        house_number, street_tokens = self.normalize(location.address)
+        key = (house_number, street_tokens)
+        self.exact[location.address] = location
+        self.normalized[key] = location
+        self.by_house_number.setdefault(house_number, set()).add(key)
+        street_trigrams = self.trigrams(street_tokens)
+        self.street_trigrams[key] = street_trigrams
+        for trigram in street_trigrams:
+            self.by_trigram.setdefault(trigram, set()).add(key)
+        self.memo.clear()
+
+    def similarity(self, trigrams, key):
+        """
+        :param trigrams: trigrams of the searched street
+        :param key: normalized key of an indexed location
+        :return: jaccard similarity of the two trigram sets
+        """
+        candidate_trigrams = self.street_trigrams[key]
+        if not trigrams and not candidate_trigrams:
+            return 1.0
+        return len(trigrams & candidate_trigrams) / len(trigrams | candidate_trigrams)
+
+    def resolve(self, address):
+        """
+        resolves an address to a location
+        exact and normalized matches are checked first, otherwise the most similar location on the shortlist is
+        returned if it meets the threshold
+        :param address: address to search for
+        :return: found location or None
+        """
+        found = self.exact.get(address)
+        if found is not None:
+            return found
+        if address in self.memo:
+            self.memo.move_to_end(address)
+            return self.memo[address]
+
+        house_number, street_tokens = self.normalize(address)
+        found = self.normalized.get((house_number, street_tokens))
+        if found is None:
+            trigrams = self.trigrams(street_tokens)
+            if house_number is not None:
+                shortlist = self.by_house_number.get(house_number, ())
+            else:
+                # no house number to narrow on, shortlist the locations sharing the most trigrams
+                shared = Counter()
+                for trigram in trigrams:
+                    shared.update(self.by_trigram.get(trigram, ()))
+                shortlist = [key for key, _ in shared.most_common(10)]
+            best_score = self.threshold
+            for key in shortlist:
+                score = self.similarity(trigrams, key)
+                if score >= best_score:
+                    best_score = score
+                    found = self.normalized[key]
+
+        self.memo[address] = found
+        if len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        return found
+
+    def resolve_many(self, addresses):
+        """
+        resolves a batch of addresses, each distinct address is only resolved once
+        :param addresses: iterable of addresses
+        :return: list of found locations (or None) in the same order as addresses
+        """
+        return [self.resolve(address) for address in addresses]
@@ -0,0 +1,157 @@
+import math
+import random
+import threading
+import time
+from RouteImprover import RouteImprover
+
+
+class AnytimeOptimizer:
+    """
+    Time budgeted route optimizer using simulated annealing with restarts
+
+    The optimizer starts from a route built by RouteImprover and keeps it as the incumbent best. Random 2-opt and
+    relocate moves are then accepted if they shorten the current route, or with probability e^(-delta / temperature)
+    if they do not. The temperature cools geometrically. Once it is cold the search reheats from the incumbent with a
+    random segment reversal, so the search keeps exploring for as long as the budget allows.
+
+    The search stops when time_budget seconds have passed or cancel() is called, checked every check_interval moves,
+    and always returns the best route found so far. on_improvement is called with (route, distance, elapsed seconds)
+    every time the incumbent improves.
+
+    With a RouteTiming a shorter route only replaces the incumbent if it is no later in total, the search itself is
+    still free to pass through late routes on its way to better ones.
+    """
+
+    def __init__(self, graph, start_location, end_location=None, time_budget=0.2, on_improvement=None, seed=None,
+                 cooling=0.999, check_interval=128, timing=None):
+        """
+        :param graph: graph providing get_distance between any two locations
+        :param start_location: the fixed first location of the route
+        :param end_location: optional fixed final location, makes the route closed
+        :param time_budget: wall clock seconds the search may run for
+        :param on_improvement: optional function called with (route, distance, elapsed) for every new incumbent
+        :param seed: optional seed for the move generator
+        :param cooling: factor the temperature is multiplied by after every move
+        :param check_interval: number of moves between checks of the clock and the cancellation flag
+        :param timing: optional RouteTiming whose windows the incumbent must not make worse
+        """
+        self.graph = graph
+        self.start_location = start_location
+        self.end_location = end_location
+        self.time_budget = time_budget
+        self.on_improvement = on_improvement
+        self.rng = random.Random(seed)
+        self.cooling = cooling
+        self.check_interval = check_interval
+        self.cancelled = threading.Event()
+        self.best_route = []
+        self.best_distance = float('inf')
+        self.best_minutes_late = 0
+        self.iterations = 0
+        self.timing = timing
+
+    def cancel(self):
+        """
+        asks a running solve to stop, it returns its incumbent at the next check. Safe to call from another thread
+        every solve starts uncancelled, so the optimizer can be reused after a cancelled run
+        :return: None
+        """
+        self.cancelled.set()
+
+    def solve(self, locations, initial_route=None):
+        """
+        searches for the shortest route visiting locations until the budget runs out or the search is cancelled
+        :param locations: locations to visit, ignored if initial_route is given
+        :param initial_route: optional route to start from instead of the RouteImprover construction
+        :return: the best route found as a list of locations
+        """
+        self.cancelled.clear()
+        started = time.perf_counter()
+        deadline = started + self.time_budget
+        improver = RouteImprover(self.graph, self.start_location, self.end_location, timing=self.timing)
+        route = list(initial_route) if initial_route is not None else improver.solve(locations)
+        self.iterations = 0
+        self.best_route = route
+        self.best_distance = improver.route_distance(route)
+        if self.timing is not None:
+            self.best_minutes_late = self.timing.lateness(route)[1]
+        self.report(started)
+        if len(route) < 2:
+            return list(self.best_route)
+
+        nodes = [self.start_location] + route
+        if self.end_location is not None:
+            nodes.append(self.end_location)
+        distances = [[self.graph.get_distance(a, b) if a is not b else 0 for b in nodes] for a in nodes]
+        # positions 1 to last can move, position 0 and (for closed routes) the final position are fixed
+        last = len(nodes) - 2 if self.end_location is not None else len(nodes) - 1
+
+        def leg(tour, a, b):
+            return distances[tour[a]][tour[b]] if b < len(tour) else 0
+
+        tour = list(range(len(nodes)))
+        best_tour = list(tour)
+        current_distance = self.best_distance
+        initial_temperature = max(self.best_distance / len(route) * 0.1, 1e-6)
+        temperature = initial_temperature
+        rng = self.rng
+
+        while True:
+            self.iterations += 1
+            if self.iterations % self.check_interval == 0:
+                if time.perf_counter() >= deadline or self.cancelled.is_set():
+                    break
+            i = rng.randint(1, last)
+            j = rng.randint(1, last)
+            if i == j:
+                continue
+            if rng.random() < 0.5:
+                # 2-opt, reverse the segment between i and j
+                i, j = min(i, j), max(i, j)
+                delta = (distances[tour[i - 1]][tour[j]] + leg(tour, i, j + 1)
+                         - distances[tour[i - 1]][tour[i]] - leg(tour, j, j + 1))
+                if delta < 0 or rng.random() < math.exp(-delta / temperature):
+                    tour[i:j + 1] = reversed(tour[i:j + 1])
+                    current_distance += delta
+            else:
+                # relocate, move the stop at i to position j
+                moved = tour[i]
+                removal_gain = distances[tour[i - 1]][moved] + leg(tour, i, i + 1)
+                if i + 1 < len(tour):
+                    removal_gain -= distances[tour[i - 1]][tour[i + 1]]
+                remaining = tour[:i] + tour[i + 1:]
+                after = remaining[j] if j < len(remaining) else None
+                insertion = distances[remaining[j - 1]][moved]
+                if after is not None:
+                    insertion += distances[moved][after] - distances[remaining[j - 1]][after]
+                delta = insertion - removal_gain
+                if delta < 0 or rng.random() < math.exp(-delta / temperature):
+                    remaining.insert(j, moved)
+                    tour[:] = remaining
+                    current_distance += delta
+
+            if current_distance < self.best_distance - 1e-9:
+                candidate = [nodes[k] for k in tour[1:last + 1]]
+                minutes_late = self.timing.lateness(candidate)[1] if self.timing is not None else 0
+                if minutes_late <= self.best_minutes_late:
+                    best_tour = list(tour)
+                    self.best_distance = current_distance
+                    self.best_minutes_late = minutes_late
+                    self.best_route = candidate
+                    self.report(started)
+
+            temperature *= self.cooling
+            if temperature < initial_temperature * 1e-3:
+                # reheat from the incumbent with a random reversal
+                tour = list(best_tour)
+                i, j = sorted(rng.sample(range(1, last + 1), 2))
+                tour[i:j + 1] = reversed(tour[i:j + 1])
+                current_distance = improver.route_distance([nodes[k] for k in tour[1:last + 1]])
+                temperature = initial_temperature
+        # the incumbent distance was accumulated from deltas, recompute it to drop rounding drift
+        self.best_distance = improver.route_distance(self.best_route)
+        return list(self.best_route)
+
+    def report(self, started):
+        if self.on_improvement:
+            self.on_improvement(list(self.best_route), self.best_distance, time.perf_counter() - started)
@@ -0,0 +1,376 @@
+import argparse
+import csv
+import gc
+import json
+import math
+import os
+import platform
+import random
+import tempfile
+import time as clock
+import tracemalloc
+from datetime import datetime
+from datetime import time
+from AddressResolver import AddressResolver
+from DestinationGraph import DestinationGraph
+from DestinationGraph import Location
+from HashTable import HashTable
+from Package import Package
+from Package import PackageStatus
+from PackageLoader import PackageLoader
+from PackageTable import PackageTable
+from PathFinderAlgorithm import PathFinderAlgorithm
+from Planner import Planner
+from RouteImprover import RouteImprover
+from SparseGraph import SparseGraph
+from SparsePathFinder import SparsePathFinder
+from TimeKeeper import TimeKeeper
+from Truck import Truck
+try:
+    from HeldKarpSolver import HeldKarpSolver
+except ImportError:
+    # NumPy is not installed, the exact solver scenario is skipped
+    HeldKarpSolver = None
+
+"""
+Synthetic city benchmarks
+
+Generates seeded cities, street networks and package manifests, runs timed scenarios for the graph, point to point
+searches, the route solvers, the package table, package file ingestion and full day planning, and writes throughput,
+latency percentiles and peak memory of every scenario to a JSON file so runs can be compared across versions.
+
+    python Benchmark.py --output bench.json
+    python Benchmark.py --quick --scenario table
+"""
+
+HUB_ADDRESS = '1 Hub Way'
+DEADLINES = ['09:00 AM', '10:30 AM', 'EOD', 'EOD', 'EOD']
+
+
+def synthetic_city(size, kind='euclidean', seed=0, extent=10.0):
+    """
+    generates a complete graph of size locations, the first one being the hub at HUB_ADDRESS
+    'euclidean' places locations at random in an extent by extent mile square and uses straight line distances.
+    'road' snaps them to a street grid and uses grid distances stretched by a random detour factor of 1.0 to 1.4 per
+    pair, which like a real road network breaks the triangle inequality now and then.
+    :param size: number of locations
+    :param kind: 'euclidean' or 'road'
+    :param seed: seed for the generator
+    :param extent: width of the city in miles
+    :return: DestinationGraph
+    """
+    rng = random.Random('%s-%s-%s' % (kind, size, seed))
+    graph = DestinationGraph()
+    locations = [Location(HUB_ADDRESS, '00000', 'Hub')]
+    locations += [Location('%d %s St' % (i * 10, street_name(i)), '%05d' % i) for i in range(1, size)]
+    if kind == 'euclidean':
+        points = [(rng.uniform(0, extent), rng.uniform(0, extent)) for _ in locations]
+    elif kind == 'road':
+        blocks = max(int(math.sqrt(size)) * 2, 2)
+        points = [(rng.randint(0, blocks) * extent / blocks, rng.randint(0, blocks) * extent / blocks)
+                  for _ in locations]
+    else:
+        raise ValueError(str('unknown city kind %s' % kind))
+    for location in locations:
+        graph.add_location(location)
+    for i, origin in enumerate(locations):
+        for j in range(i):
+            (x1, y1), (x2, y2) = points[i], points[j]
+            if kind == 'euclidean':
+                distance = math.hypot(x1 - x2, y1 - y2)
+            else:
+                distance = (abs(x1 - x2) + abs(y1 - y2)) * rng.uniform(1.0, 1.4)
+            # the distance table is given to a tenth of a mile, and no two locations share a spot
+            graph.add_edge(origin, locations[j], max(round(distance, 1), 0.1))
+    return graph
+
+
+def synthetic_road_network(side, seed=0, block=0.1):
+    """
+    generates a street grid of side by side intersections a block apart, one in ten streets between two intersections
+    is missing and the others are up to half again as long as the block, as if they curve
+    :param side: intersections per row and column
+    :param seed: seed for the generator
+    :param block: miles between neighbouring intersections
+    :return: SparseGraph whose locations have coordinates
+    """
+    rng = random.Random('road-network-%s-%s' % (side, seed))
+    locations = [Location('%d %s Ave' % (column, row), coordinates=(column * block, row * block))
+                 for row in range(side) for column in range(side)]
+    edges = []
+    for i, location in enumerate(locations):
+        row, column = divmod(i, side)
+        if column + 1 < side and rng.random() < .9:
+            edges.append((location, locations[i + 1], round(block * rng.uniform(1, 1.5), 3)))
+        if row + 1 < side and rng.random() < .9:
+            edges.append((location, locations[i + side], round(block * rng.uniform(1, 1.5), 3)))
+    return SparseGraph.from_edges(locations, edges)
+
+
+def street_name(i):
+    names = ['Main', 'State', 'Oak', 'Pine', 'Maple', 'Cedar', 'Elm', 'Lake', 'Hill', 'Park']
+    return '%s %s' % (names[i % len(names)], names[i // len(names) % len(names)])
+
+
+def synthetic_rows(graph, rows, seed=0):
+    """
+    generates package file rows for random non hub destinations of graph
+    :return: generator of lists in package_file.csv column order
+    """
+    rng = random.Random('manifest-%s-%s' % (rows, seed))
+    destinations = [location for location in graph.adjacency_list if location.address != HUB_ADDRESS]
+    for package_id in range(1, rows + 1):
+        location = rng.choice(destinations)
+        yield [package_id, location.address, 'Salt Lake City', 'UT', location.zip, rng.choice(DEADLINES),
+               rng.randint(1, 80), '']
+
+
+def synthetic_manifest(graph, rows, seed=0, current_time=None):
+    """
+    :return: list of Package built from synthetic_rows, new objects on every call so no table has registered on them
+    """
+    current_time = current_time or TimeKeeper().current_time
+    locations = {location.address: location for location in graph.adjacency_list}
+    deadlines = {deadline: PackageLoader.deadline_from_text(deadline) for deadline in DEADLINES}
+    return [Package(package_id, locations[address], city, state, zip, deadlines[deadline], weight, notes, current_time)
+            for package_id, address, city, state, zip, deadline, weight, notes in synthetic_rows(graph, rows, seed)]
+
+
+def percentile(sorted_values, fraction):
+    """
+    nearest rank percentile
+    :param sorted_values: values in ascending order
+    :param fraction: 0 to 1
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+class Benchmark:
+    """
+    Runs scenarios and collects their results
+
+    A scenario is a setup function run once, untimed, and an operation run repeats times. Every repeat is timed on its
+    own for the latency percentiles and throughput counts operations per second over all repeats, an operation being
+    whatever unit the scenario names (queries, inserts, packages). Peak memory is traced in one extra run, kept apart
+    from the timed ones since tracing slows Python down.
+    """
+
+    def __init__(self, seed=0, quick=False, only=None):
+        """
+        :param seed: seed for every generator
+        :param quick: smaller sizes and fewer repeats, for a smoke run
+        :param only: optional list of scenario name prefixes to run
+        """
+        self.seed = seed
+        self.quick = quick
+        self.only = only
+        self.results = []
+
+    def wanted(self, name):
+        return not self.only or any(name.startswith(prefix) for prefix in self.only)
+
+    def measure(self, name, setup, operation, operations=1, repeats=5, **params):
+        """
+        :param name: scenario name
+        :param setup: function returning the state operation works on, not timed
+        :param operation: function taking the state from setup
+        :param operations: units of work one call of operation does, for throughput
+        :param repeats: number of timed calls
+        :param params: scenario parameters recorded with the result
+        :return: None
+        """
+        if not self.wanted(name):
+            return
+        latencies = []
+        for _ in range(repeats):
+            state = setup()
+            gc.collect()
+            started = clock.perf_counter()
+            operation(state)
+            latencies.append(clock.perf_counter() - started)
+        state = setup()
+        gc.collect()
+        tracemalloc.start()
+        operation(state)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        latencies.sort()
+        total = sum(latencies)
+        result = {
+            'scenario': name,
+            'params': params,
+            'repeats': repeats,
+            'operations': operations,
+            'seconds': total,
+            'throughput': operations * repeats / total if total else float('inf'),
+            'latency_ms': {'p50': percentile(latencies, .5) * 1000, 'p90': percentile(latencies, .9) * 1000,
+                           'p99': percentile(latencies, .99) * 1000, 'max': latencies[-1] * 1000},
+            'peak_memory_kb': peak / 1024,
+        }
+        self.results.append(result)
+        print('%-34s %-34s %12.1f ops/s  p50 %9.2f ms  peak %9.0f KB' % (
+            name, ' '.join('%s=%s' % item for item in params.items()), result['throughput'],
+            result['latency_ms']['p50'], result['peak_memory_kb']))
+
+    def run(self):
+        """
+        runs every scenario
+        :return: the list of results
+        """
+        self.graph_scenarios()
+        self.road_network_scenarios()
+        self.solver_scenarios()
+        self.table_scenarios()
+        self.ingest_scenarios()
+        self.dispatch_scenarios()
+        return self.results
+
+    def graph_scenarios(self):
+        for kind in ('euclidean', 'road'):
+            for size in ((30, 100) if self.quick else (30, 100, 300)):
+                graph = synthetic_city(size, kind, self.seed)
+                sources = list(graph.adjacency_list)[:20]
+                self.measure('graph.shortest_path_tree', lambda: None,
+                             lambda state: [PathFinderAlgorithm(graph, source) for source in sources],
+                             operations=len(sources), repeats=3, kind=kind, locations=size)
+
+    def road_network_scenarios(self):
+        for side in ((100,) if self.quick else (100, 300)):
+            network = synthetic_road_network(side, self.seed)
+            rng = random.Random(self.seed)
+            pairs = [(rng.choice(network.locations), rng.choice(network.locations)) for _ in range(10)]
+            for method in SparsePathFinder.METHODS:
+                self.measure('graph.point_to_point', lambda: None,
+                             lambda state: [SparsePathFinder(network, start, [end], method) for start, end in pairs],
+                             operations=len(pairs), repeats=3, method=method, intersections=len(network),
+                             edges=network.edge_count())
+
+    def solver_scenarios(self):
+        for kind in ('euclidean', 'road'):
+            graph = synthetic_city(60, kind, self.seed)
+            locations = list(graph.adjacency_list)
+            hub = locations[0]
+            rng = random.Random(self.seed)
+            stops = set(rng.sample(locations[1:], 12))
+            planner = Planner.from_graph(graph, HUB_ADDRESS)
+            self.measure('solver.find_solution', lambda: None,
+                         lambda state: planner.find_solution(stops, hub, 12, 200, seed=self.seed),
+                         repeats=3, kind=kind, stops=len(stops), calculations=200)
+            self.measure('solver.local_search', lambda: None,
+                         lambda state: RouteImprover(graph, hub, hub).solve(locations[1:]),
+                         repeats=3, kind=kind, stops=len(locations) - 1)
+            if HeldKarpSolver:
+                self.measure('solver.held_karp', lambda: None,
+                             lambda state: HeldKarpSolver(graph, hub, hub).solve(stops),
+                             repeats=3, kind=kind, stops=len(stops))
+
+    def table_scenarios(self):
+        graph = synthetic_city(100, 'road', self.seed)
+        for rows in ((10, 1000, 10000) if self.quick else (10, 100, 1000, 10000, 100000)):
+            packages = synthetic_manifest(graph, rows, self.seed)
+            ids = [package.id for package in packages]
+            repeats = 3 if rows >= 10000 else 5
+            self.measure('table.insert', HashTable,
+                         lambda table: [table.insert(package) for package in packages],
+                         operations=rows, repeats=repeats, rows=rows)
+            # a PackageTable registers itself on every package it holds, so each table gets packages of its own or
+            # the listeners of earlier repeats would pile up on them
+            self.measure('table.bulk_insert', lambda: (PackageTable(), synthetic_manifest(graph, rows, self.seed)),
+                         lambda state: state[0].bulk_insert(state[1]),
+                         operations=rows, repeats=repeats, rows=rows)
+
+            def filled_table():
+                table = PackageTable()
+                table.bulk_insert(synthetic_manifest(graph, rows, self.seed))
+                return table
+            self.measure('table.search', filled_table,
+                         lambda table: [table.search(package_id) for package_id in ids],
+                         operations=rows, repeats=repeats, rows=rows)
+            route = list(graph.adjacency_list)[1:11]
+            self.measure('table.query', filled_table,
+                         lambda table: table.query(PackageStatus.AT_HUB, time(10, 31), route),
+                         repeats=repeats, rows=rows)
+            self.measure('table.filter_scan', filled_table,
+                         lambda table: table.filter_packages(lambda p: p.status is PackageStatus.AT_HUB and
+                                                             p.deadline.time() < time(10, 31) and p.location in route),
+                         repeats=repeats, rows=rows)
+
+    def ingest_scenarios(self):
+        graph = synthetic_city(100, 'road', self.seed)
+        resolver = AddressResolver(graph.adjacency_list)
+        for rows in ((1000, 10000) if self.quick else (1000, 10000, 100000)):
+            with tempfile.TemporaryDirectory() as directory:
+                file_path = os.path.join(directory, 'package_file.csv')
+                with open(file_path, 'w', newline='') as package_file:
+                    writer = csv.writer(package_file)
+                    writer.writerow(PackageLoader.FIELDNAMES)
+                    writer.writerows(synthetic_rows(graph, rows, self.seed))
+                loader = PackageLoader(resolver, TimeKeeper().current_time)
+                self.measure('ingest.package_file', PackageTable,
+                             lambda table: loader.load_all(file_path, table),
+                             operations=rows, repeats=3, rows=rows)
+
+    def dispatch_scenarios(self):
+        for locations, rows, trucks in ((30, 100, 2), (60, 400, 6)) if self.quick else \
+                ((30, 100, 2), (60, 400, 6), (150, 2000, 20)):
+            graph = synthetic_city(locations, 'road', self.seed)
+
+            def day():
+                planner = Planner.from_graph(graph, HUB_ADDRESS, synthetic_manifest(graph, rows, self.seed))
+                hub = planner.search_location(HUB_ADDRESS)
+                return planner, [Truck('Truck %d' % i, hub, TimeKeeper(time(8))) for i in range(trucks)]
+
+            def plan_day(state):
+                planner, fleet = state
+                planner.simulate_fleet(fleet, delayed_arrival=None)
+                if planner.get_remaining_packages():
+                    raise RuntimeError('synthetic day left packages at the hub')
+            self.measure('dispatch.full_day', day, plan_day, operations=rows, repeats=3,
+                         locations=locations, packages=rows, trucks=trucks)
+
+        def wgups_day():
+            planner = Planner()
+            planner.process_special_packages()
+            hub = planner.search_location(planner.hub_address)
+            return planner, Truck('Truck 1', hub, TimeKeeper(time(8))), Truck('Truck 2', hub, TimeKeeper(time(9, 15)))
+
+        def dispatch_wgups(state):
+            planner, first_truck, second_truck = state
+            planner.dispatch_priority_truck(first_truck)
+            planner.dispatch_delayed_priority_truck(second_truck)
+            planner.dispatch_standard_truck(second_truck)
+        if os.path.exists('./assets/distance_table.csv'):
+            self.measure('dispatch.wgups_day', wgups_day, dispatch_wgups, operations=40, repeats=5)
+
+    def write(self, file_path):
+        """
+        writes the results with a description of the machine they were measured on
+        :param file_path: JSON file to write
+        :return: None
+        """
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'seed': self.seed,
+            'quick': self.quick,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': HeldKarpSolver is not None,
+            'results': self.results,
+        }
+        with open(file_path, 'w') as results_file:
+            json.dump(report, results_file, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='runs the synthetic city benchmarks')
+    parser.add_argument('--output', default='bench_results.json', help='JSON file the results are written to')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the generated cities and manifests')
+    parser.add_argument('--quick', action='store_true', help='smaller sizes for a fast smoke run')
+    parser.add_argument('--scenario', action='append', help='only run scenarios starting with this, repeatable')
+    args = parser.parse_args()
+    benchmark = Benchmark(args.seed, args.quick, args.scenario)
+    benchmark.run()
+    benchmark.write(args.output)
+    print('results written to %s' % args.output)
@@ -0,0 +1,159 @@
+from bisect import bisect_left, bisect_right
+from Package import PackageStatus
+
+
+class DeliveryLog:
+    """
+    Append only log of package status changes, ordered by the time they happened
+
+    Every event is a (time, package id, previous status, status) entry stored across four parallel lists. Trucks keep
+    their own clocks, so events can be appended out of time order. The lists are sorted once, stably, the next time
+    they are queried, after which every query bisects the times list:
+        snapshot(t)             status of every package at t, replays only the events up to t
+        changes_between(a, b)   the events from a to b, a slice of the log
+        counts_at(t)            packages per status at t, O(log n) from running counts kept per event
+        status_at(id, t)        status of one package at t, O(log k) over that package's own k events
+
+    The log listens to the packages it tracks, so set_at_hub, set_in_transit and set_delivered are recorded as they
+    happen.
+    """
+
+    def __init__(self):
+        self.times = []
+        self.package_ids = []
+        self.previous_statuses = []
+        self.statuses = []
+        # package id -> list of (time, sequence number, status) in time order
+        self.by_package = {}
+        # status -> number of packages in that status after each event, rebuilt with the sort
+        self.counts = None
+        self.in_order = True
+
+    @classmethod
+    def from_packages(cls, packages):
+        """
+        :param packages: packages to track
+        :return: DeliveryLog holding every status change of packages
+        """
+        log = cls()
+        log.track(packages)
+        return log
+
+    def __len__(self):
+        return len(self.times)
+
+    def track(self, packages):
+        """
+        records the history packages already have (hub arrival, departure, delivery) and listens for further changes
+        :param packages: packages to track
+        :return: None
+        """
+        for package in packages:
+            if package.id not in self.by_package:
+                self.record(package.id, PackageStatus.AT_HUB, package.hub_time)
+                if package.transit_time is not None:
+                    self.record(package.id, PackageStatus.IN_TRANSIT, package.transit_time, PackageStatus.AT_HUB)
+                if package.delivery_time is not None:
+                    self.record(package.id, PackageStatus.DELIVERED, package.delivery_time, PackageStatus.IN_TRANSIT)
+            package.add_listener(self)
+
+    def package_status_changed(self, package, old_status):
+        """
+        called by a tracked package whenever its status changes
+        """
+        self.record(package.id, package.status, package.status_time, old_status)
+
+    def record(self, package_id, status, time, previous_status=None):
+        """
+        appends an event
+        :param package_id: id of the package that changed
+        :param status: the status it changed to
+        :param time: datetime of the change
+        :param previous_status: the status it changed from, None for its first event
+        :return: None
+        """
+        if self.times and time < self.times[-1]:
+            self.in_order = False
+        sequence = len(self.times)
+        self.times.append(time)
+        self.package_ids.append(package_id)
+        self.previous_statuses.append(previous_status)
+        self.statuses.append(status)
+        events = self.by_package.setdefault(package_id, [])
+        if events and (time, sequence) < events[-1][:2]:
+            events.insert(bisect_right(events, (time, sequence)), (time, sequence, status))
+        else:
+            events.append((time, sequence, status))
+        self.counts = None
+
+    def sort(self):
+        """
+        puts the events in time order, events at the same time keep the order they were recorded in
+        and rebuilds the running status counts
+        :return: None
+        """
+        if not self.in_order:
+            order = sorted(range(len(self.times)), key=self.times.__getitem__)
+            self.times = [self.times[i] for i in order]
+            self.package_ids = [self.package_ids[i] for i in order]
+            self.previous_statuses = [self.previous_statuses[i] for i in order]
+            self.statuses = [self.statuses[i] for i in order]
+            self.in_order = True
+        if self.counts is None:
+            running = {status: 0 for status in PackageStatus}
+            self.counts = {status: [] for status in PackageStatus}
+            for previous_status, status in zip(self.previous_statuses, self.statuses):
+                if previous_status is not None:
+                    running[previous_status] -= 1
+                running[status] += 1
+                for counted_status, count in running.items():
+                    self.counts[counted_status].append(count)
+
+    def snapshot(self, time):
+        """
+        :param time: datetime to look at
+        :return: dict of package id to a tuple of its status at time and when it changed to that status, packages
+        without any event up to time are left out
+        """
+        self.sort()
+        end = bisect_right(self.times, time)
+        # later events overwrite earlier ones for the same package
+        return dict(zip(self.package_ids[:end], zip(self.statuses[:end], self.times[:end])))
+
+    def changes_between(self, start, end):
+        """
+        :param start: datetime the period starts at, inclusive
+        :param end: datetime the period ends at, inclusive
+        :return: list of (time, package id, previous status, status) events in time order
+        """
+        self.sort()
+        first = bisect_left(self.times, start)
+        last = bisect_right(self.times, end)
+        return list(zip(self.times[first:last], self.package_ids[first:last], self.previous_statuses[first:last],
+                        self.statuses[first:last]))
+
+    def counts_at(self, time):
+        """
+        :param time: datetime to look at
+        :return: dict of PackageStatus to the number of packages in it at time
+        """
+        self.sort()
+        end = bisect_right(self.times, time)
+        if end == 0:
+            return {status: 0 for status in PackageStatus}
+        return {status: counts[end - 1] for status, counts in self.counts.items()}
+
+    def status_at(self, package_id, time):
+        """
+        :param package_id: id of the package to look at
+        :param time: datetime to look at
+        :return: a tuple of the package's status at time and when it changed to that status, or None if the package
+        has no event up to time
+        """
+        events = self.by_package.get(package_id, [])
+        # sequence numbers are never negative, so (time, inf) sorts after every event at time
+        i = bisect_right(events, (time, float('inf')))
+        if i == 0:
+            return None
+        event_time, _, status = events[i - 1]
+        return status, event_time
@@ -3,22 +3,16 @@ class Location:
     Location serves as a vertex in the graph created below
     each location is given an address parameter which will serve as the locations label used in the graph below
 
-    distance and predecessor parameters are used as helpers in the pathfinding algorithm implemented elseware
-
-    distance is initialized to infinity serves as the distance between its predecessor in each iteration of the
-    pathfinding algorithm. Predecessor serves as the previous vertex in each iteration.
-
     name and zipcode are captured for future expansion but not used in algorithm
     name is used in __str__ override
+    coordinates is an optional planar (x, y) position, SparsePathFinder uses it to guide A* searches
     """
 
-    def __init__(self, address, zipcode=None, name=None):
+    def __init__(self, address, zipcode=None, name=None, coordinates=None):
         self.name = name
         self.zip = zipcode
         self.address = address
-        self.distance = float('inf')
-        self.predecessor = None
-        self.sequence_to_start = []
+        self.coordinates = coordinates
 
     def __str__(self):
         if self.name:
@@ -33,14 +27,71 @@ class DestinationGraph:
     a parameter called edge_weights stores all of the distances as weights between each vertex
     a parameter called adjacency_list stores all of locations as a dict, and the destinations
     reachable from a location as a list, with each destination being a list entry
+    an optional dense DistanceMatrix backend can be requested with get_distance_matrix and a sparse SparseGraph backend
+    with get_sparse_graph, both are built on first use and discarded whenever a location or edge is added
+    a graph made with from_distance_matrix starts out with only the matrix, adjacency_list and edge_weights are built
+    from it the first time either is used
     """
 
     def __init__(self):
-        self.edge_weights = {}
-        self.adjacency_list = {}
+        self._edge_weights = {}
+        self._adjacency_list = {}
+        self.distance_matrix = None
+        self.sparse_graph = None
+
+    @classmethod
+    def from_distance_matrix(cls, distance_matrix):
+        """
+        wraps a DistanceMatrix without copying it into dicts, e.g. a memory mapped one read by GraphCache
+        :param distance_matrix: DistanceMatrix holding every location and distance of the graph
+        :return: DestinationGraph
+        """
+        graph = cls()
+        graph._edge_weights = None
+        graph._adjacency_list = None
+        graph.distance_matrix = distance_matrix
+        return graph
+
+    @property
+    def adjacency_list(self):
+        if self._adjacency_list is None:
+            self.build_adjacency()
+        return self._adjacency_list
+
+    @property
+    def edge_weights(self):
+        if self._edge_weights is None:
+            self.build_adjacency()
+        return self._edge_weights
+
+    def build_adjacency(self):
+        """
+        fills adjacency_list and edge_weights from distance_matrix, infinite distances are not edges
+        the matrix is symmetric so only its lower triangle is read, add_edge stores both directions
+        :return: None
+        """
+        distance_matrix = self.distance_matrix
+        locations = distance_matrix.locations
+        self._adjacency_list = {location: [] for location in locations}
+        self._edge_weights = {}
+        for i, row in enumerate(distance_matrix.matrix.tolist()):
+            for j in range(i + 1):
+                if row[j] != float('inf'):
+                    self.add_edge(locations[i], locations[j], row[j])
+        self.distance_matrix = distance_matrix
+
+    def get_locations(self):
+        """
+        :return: a list of every location, without building adjacency_list for a graph made from a distance matrix
+        """
+        if self._adjacency_list is None:
+            return list(self.distance_matrix.locations)
+        return list(self._adjacency_list)
 
     def add_location(self, new_location):
         self.adjacency_list[new_location] = []
+        self.distance_matrix = None
+        self.sparse_graph = None
 
     def add_edge(self, origin, destination, distance):
         """
@@ -58,8 +109,31 @@ class DestinationGraph:
         self.adjacency_list[destination].append(origin)
         self.edge_weights[(origin, destination)] = distance
         self.edge_weights[(destination, origin)] = distance
+        self.distance_matrix = None
+        self.sparse_graph = None
 
     def get_distance(self, l1, l2):
+        if self._edge_weights is None:
+            return self.distance_matrix.get_distance(l1, l2)
         return self.edge_weights[(l1,l2)]
 
+    def get_distance_matrix(self):
+        """
+        returns the dense, index based DistanceMatrix of this graph, building it if the graph changed since last call
+        requires NumPy
+        :return: DistanceMatrix
+        """
+        if self.distance_matrix is None:
+            from DistanceMatrix import DistanceMatrix
+            self.distance_matrix = DistanceMatrix.from_graph(self)
+        return self.distance_matrix
 
+    def get_sparse_graph(self):
+        """
+        returns the CSR based SparseGraph of this graph, building it if the graph changed since last call
+        :return: SparseGraph
+        """
+        if self.sparse_graph is None:
+            from SparseGraph import SparseGraph
+            self.sparse_graph = SparseGraph.from_graph(self)
+        return self.sparse_graph
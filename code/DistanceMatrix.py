@@ -0,0 +1,89 @@
+import numpy as np
+
+
+class DistanceMatrix:
+    """
+    Dense, index based view of a DestinationGraph
+    every location is given an integer index and all edge weights are stored in a contiguous float64 NumPy matrix
+    where matrix[i][j] is the distance from location i to location j. Missing edges are stored as infinity and the
+    distance from a location to itself is 0.
+
+    Lookups are a single array index instead of hashing two locations and a tuple, and the row and distances methods
+    return many distances at once so callers can work on whole rows instead of one edge at a time.
+
+    This backend needs NumPy, which is otherwise not required by the project. It is only imported when a matrix is
+    requested through DestinationGraph.get_distance_matrix()
+    """
+
+    def __init__(self, locations, matrix):
+        """
+        :param locations: a sequence of locations, the position of each location is its index in matrix
+        :param matrix: a square array like of distances with one row and column per location
+        """
+        self.locations = list(locations)
+        self.index = {location: i for i, location in enumerate(self.locations)}
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        if self.matrix.shape != (len(self.locations), len(self.locations)):
+            raise ValueError(str('distance matrix shape %s does not match %s locations' % (
+                self.matrix.shape, len(self.locations))))
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        builds a matrix from the locations and edge weights of a DestinationGraph
+        :param graph: the DestinationGraph to convert
+        :return: DistanceMatrix
+        """
+        locations = list(graph.adjacency_list)
+        index = {location: i for i, location in enumerate(locations)}
+        matrix = np.full((len(locations), len(locations)), np.inf, dtype=np.float64)
+        np.fill_diagonal(matrix, 0)
+        for (origin, destination), distance in graph.edge_weights.items():
+            matrix[index[origin], index[destination]] = distance
+        return cls(locations, matrix)
+
+    def index_of(self, location):
+        """
+        :param location: location to look up
+        :return: the integer index of location
+        """
+        return self.index[location]
+
+    def location_at(self, i):
+        """
+        :param i: integer index
+        :return: the location stored at index i
+        """
+        return self.locations[i]
+
+    def indices(self, locations):
+        """
+        converts a sequence of locations to their indices
+        :param locations: a sequence of locations
+        :return: a NumPy integer array of indices
+        """
+        return np.fromiter((self.index[location] for location in locations), dtype=np.intp)
+
+    def get_distance(self, l1, l2):
+        return float(self.matrix[self.index[l1], self.index[l2]])
+
+    def row(self, src):
+        """
+        :param src: the origin location
+        :return: a read only view of the distances from src to every location, ordered by index
+        """
+        view = self.matrix[self.index[src]]
+        view.flags.writeable = False
+        return view
+
+    def distances(self, src, dsts):
+        """
+        vectorized lookup of the distances from one location to many
+        :param src: the origin location
+        :param dsts: a sequence of destination locations
+        :return: a NumPy array of distances in the same order as dsts
+        """
+        return self.matrix[self.index[src], self.indices(dsts)]
+
+    def __len__(self):
+        return len(self.locations)
@@ -0,0 +1,272 @@
+import heapq
+import itertools
+from datetime import timedelta
+
+
+class SimulationEvent:
+    """
+    One event of a FleetSimulator run, passed to hooks
+
+    kind is one of 'arrival' (packages reach the hub), 'departure' (a truck leaves the hub with a load), 'stop' (a truck
+    reaches a location on its route), 'delivery' (the packages for a stop are handed over), 'return' (a truck is back at
+    the hub) and 'idle' (a truck at the hub has no trip left to start).
+    """
+
+    __slots__ = ('time', 'kind', 'truck', 'location', 'packages')
+
+    def __init__(self, time, kind, truck=None, location=None, packages=()):
+        self.time = time
+        self.kind = kind
+        self.truck = truck
+        self.location = location
+        self.packages = packages
+
+    def __str__(self):
+        return str('%s %s %s %s %s' % (self.time.strftime('%H:%M'), self.kind, self.truck.name if self.truck else '',
+                                       self.location.address if self.location else '',
+                                       ' '.join(str(p.id) for p in self.packages)))
+
+
+class FleetSimulator:
+    """
+    Discrete event simulation of a fleet of trucks sharing one clock
+
+    Events wait in a heap ordered by time, events at the same time run in the order they were scheduled. Running the
+    simulation pops events one at a time, moves the clock to the event's time and handles it, which usually schedules
+    the next event of the same truck:
+        departure   the truck loads its trip's packages and heads for the first stop
+        stop        the truck drives the leg, its delivery event is scheduled for the same time
+        delivery    the truck hands over every package for the stop, then heads for the next stop or the hub
+        return      the truck is back at the hub and starts its next queued trip, or goes idle
+        arrival     late packages reach the hub, trips waiting for them can depart
+
+    A trip does not depart before its departure time, before the truck is back at the hub, or before every one of its
+    packages has arrived. Like dispatch_truck, a trip keeps driving its route until the truck is empty.
+
+    Trucks keep their Truck API and bookkeeping: their own clock is set to the shared clock before every leg, and legs
+    take whole minutes at speed, the way TimeKeeper advances time, so a truck's clock matches the simulation after
+    every event. Every handled event is passed to the hooks registered for its kind and to the hooks registered for
+    None, which receive every event. Handlers return False for events that turned out not to apply, those are not
+    passed to hooks.
+    """
+
+    def __init__(self, graph, hub_location, start_time, speed=18):
+        """
+        :param graph: graph providing get_distance between any two locations
+        :param hub_location: location trucks load at and return to
+        :param start_time: datetime the simulation clock starts at
+        :param speed: truck speed in miles per hour
+        """
+        self.graph = graph
+        self.hub_location = hub_location
+        self.current_time = start_time
+        self.speed = speed
+        self.events = []
+        self.sequence = itertools.count()
+        self.hooks = {}
+        # truck -> list of (departure time, route, packages) not started yet, in the order they were scheduled
+        self.trips = {}
+        # truck -> state of the trip it is driving: route, position on route, stops made without a delivery and the
+        # stop it is heading to with its arrival time
+        self.active_trips = {}
+        self.pending_packages = set()
+        self.events_handled = 0
+
+    def add_hook(self, function, kind=None):
+        """
+        :param function: called with the SimulationEvent after it is handled
+        :param kind: event kind to call function for, None for every event
+        :return: None
+        """
+        self.hooks.setdefault(kind, []).append(function)
+
+    def schedule(self, time, kind, truck=None, location=None, packages=()):
+        heapq.heappush(self.events, (time, next(self.sequence), SimulationEvent(time, kind, truck, location, packages)))
+
+    def schedule_arrival(self, time, packages):
+        """
+        makes packages unavailable until time, when they arrive at the hub
+        :param time: datetime the packages arrive
+        :param packages: packages arriving
+        :return: None
+        """
+        packages = tuple(packages)
+        self.pending_packages.update(packages)
+        self.schedule(time, 'arrival', packages=packages)
+
+    def schedule_trip(self, truck, route, packages, departure_time=None):
+        """
+        queues a trip for truck, trips of one truck are driven in the order they are scheduled
+        :param truck: truck to drive the trip, it has to be at the hub when the trip starts
+        :param route: sequence of locations to visit
+        :param packages: packages to load
+        :param departure_time: earliest datetime the trip may start, defaults to the start of the simulation
+        :return: None
+        """
+        queue = self.trips.setdefault(truck, [])
+        queue.append((departure_time or self.current_time, list(route), list(packages)))
+        if truck not in self.active_trips and len(queue) == 1:
+            self.schedule(max(queue[0][0], self.current_time), 'departure', truck, self.hub_location)
+
+    def leg_minutes(self, distance):
+        return round(distance * 60 / self.speed)
+
+    def drive(self, truck, location, returning=False):
+        """
+        schedules truck's arrival at location, its next stop or, when returning, the hub
+        :param returning: whether truck is empty and heading back to the hub to end its trip
+        :return: None
+        """
+        distance = self.graph.get_distance(truck.current_location, location)
+        arrival = self.current_time + timedelta(minutes=self.leg_minutes(distance))
+        if returning:
+            # the way back to the hub cannot be repaired, remaining_route refuses it
+            self.active_trips[truck].pop('heading', None)
+        else:
+            self.active_trips[truck]['heading'] = (location, arrival)
+        self.schedule(arrival, 'return' if returning else 'stop', truck, location)
+
+    def next_stop(self, truck):
+        """
+        :return: the next location on truck's route it is not already at, looping the route like dispatch_truck. The hub
+        is passed over while the truck has packages on board, a trip only ends there once the truck is empty
+        """
+        trip = self.active_trips[truck]
+        route = trip['route']
+        loaded = truck.get_package_count() > 0
+        for _ in range(len(route)):
+            location = route[trip['position'] % len(route)]
+            trip['position'] += 1
+            if location is not truck.current_location and not (loaded and location is self.hub_location):
+                return location
+        return None
+
+    def remaining_route(self, truck):
+        """
+        the part of truck's trip that can still be changed, for RouteRepair
+        :param truck: truck driving a trip
+        :return: a tuple of the location truck is driving to, the datetime it gets there and the stops after it that
+        still have packages, in the order the trip reaches them
+        """
+        trip = self.active_trips.get(truck)
+        if trip is None or 'heading' not in trip:
+            raise ValueError(str('%s is not out on a delivery trip' % truck.name))
+        heading, arrival = trip['heading']
+        route = trip['route']
+        upcoming = [route[(trip['position'] + i) % len(route)] for i in range(len(route))]
+        stops = []
+        for location in upcoming:
+            if location is not heading and location in truck.stops and location not in stops:
+                stops.append(location)
+        return heading, arrival, stops
+
+    def reroute(self, truck, route):
+        """
+        replaces the stops of truck's trip after the location it is driving to, the leg under way is not changed
+        :param truck: truck driving a trip
+        :param route: sequence of locations to visit after the current leg
+        :return: None
+        """
+        trip = self.active_trips.get(truck)
+        if trip is None:
+            raise ValueError(str('%s is not out on a delivery trip' % truck.name))
+        trip['route'] = list(route)
+        trip['position'] = 0
+        trip['empty_stops'] = 0
+
+    def run(self, until=None):
+        """
+        handles events in time order until none are left or the next one is after until
+        :param until: optional datetime to stop at
+        :return: the number of events handled
+        """
+        handled = 0
+        while self.events and (until is None or self.events[0][0] <= until):
+            time, _, event = heapq.heappop(self.events)
+            self.current_time = time
+            if getattr(self, 'handle_' + event.kind)(event) is False:
+                # the event no longer applies, e.g. a departure for a truck that has already left
+                continue
+            handled += 1
+            for hook in self.hooks.get(event.kind, ()):
+                hook(event)
+            for hook in self.hooks.get(None, ()):
+                hook(event)
+        self.events_handled += handled
+        return handled
+
+    def sync_clock(self, truck):
+        truck.internal_timeline.current_time = self.current_time
+
+    def handle_arrival(self, event):
+        for package in event.packages:
+            package.set_at_hub(self.current_time)
+        self.pending_packages.difference_update(event.packages)
+        # trips held back by these packages may be able to leave now
+        for truck, queue in self.trips.items():
+            if queue and truck not in self.active_trips and truck.current_location is self.hub_location:
+                if any(package in event.packages for package in queue[0][2]):
+                    self.schedule(max(queue[0][0], self.current_time), 'departure', truck, self.hub_location)
+
+    def handle_departure(self, event):
+        truck = event.truck
+        queue = self.trips.get(truck)
+        if truck in self.active_trips or not queue or queue[0][0] > self.current_time:
+            # a stale departure, the truck is out or the trip is scheduled later
+            return False
+        departure_time, route, packages = queue[0]
+        if self.pending_packages.intersection(packages):
+            # handle_arrival schedules the departure again once the packages are in
+            return False
+        queue.pop(0)
+        self.sync_clock(truck)
+        truck.load(packages)
+        event.packages = tuple(packages)
+        self.active_trips[truck] = {'route': route, 'position': 0, 'empty_stops': 0}
+        self.drive_on(truck)
+
+    def drive_on(self, truck):
+        """
+        sends truck to its next stop, or back to the hub once it is empty
+        :return: None
+        """
+        if not truck.get_package_count():
+            self.drive(truck, self.hub_location, returning=True)
+            return
+        trip = self.active_trips[truck]
+        location = self.next_stop(truck)
+        if location is None or trip['empty_stops'] > len(trip['route']):
+            raise ValueError(str('%s carries packages for locations that are not on its route' % truck.name))
+        self.drive(truck, location)
+
+    def handle_stop(self, event):
+        truck = event.truck
+        distance = self.graph.get_distance(truck.current_location, event.location)
+        truck.internal_timeline.current_time = self.current_time - timedelta(minutes=self.leg_minutes(distance))
+        truck.travel_to_location(event.location, distance)
+        self.schedule(self.current_time, 'delivery', truck, event.location)
+
+    def handle_delivery(self, event):
+        truck = event.truck
+        self.sync_clock(truck)
+        event.packages = tuple(truck.stops.get(truck.current_location, ()))
+        truck.deliver_package()
+        trip = self.active_trips[truck]
+        trip['empty_stops'] = 0 if event.packages else trip['empty_stops'] + 1
+        self.drive_on(truck)
+
+    def handle_return(self, event):
+        truck = event.truck
+        distance = self.graph.get_distance(truck.current_location, self.hub_location)
+        truck.internal_timeline.current_time = self.current_time - timedelta(minutes=self.leg_minutes(distance))
+        truck.return_to_hub(distance)
+        del self.active_trips[truck]
+        queue = self.trips.get(truck)
+        if queue:
+            self.schedule(max(queue[0][0], self.current_time), 'departure', truck, self.hub_location)
+        else:
+            self.schedule(self.current_time, 'idle', truck, self.hub_location)
+
+    def handle_idle(self, event):
+        # hooks on 'idle' may schedule another trip for the truck
+        pass
@@ -0,0 +1,186 @@
+from datetime import timedelta
+from RouteImprover import RouteImprover
+
+
+class FleetSolver:
+    """
+    Plans closed hub to hub delivery routes for a whole fleet of trucks in one call
+
+    Every destination is a customer whose demand is its package count, destinations with more packages than a truck
+    holds are split into several customers. Routes are built jointly for all customers:
+        1. Clarke-Wright savings construction, every customer starts on its own route and the pair of route ends that
+           saves the most distance d(hub, i) + d(hub, j) - d(i, j) is merged while the merged load fits a truck
+        2. inter-route exchange, customers are relocated to another route or swapped with a customer of another route
+           whenever that shortens the total distance without exceeding capacity
+        3. each route is polished on its own by RouteImprover
+    The routes are then handed out longest first to whichever truck is back at the hub earliest, so trucks make
+    several trips when there are more routes than trucks.
+
+    Capacity is the smallest package_limit in the fleet so any route can be driven by any truck.
+    """
+
+    def __init__(self, graph, hub_location, speed=18):
+        """
+        :param graph: graph providing get_distance between any two locations
+        :param hub_location: location every route starts and ends at
+        :param speed: truck speed in miles per hour, used to estimate when a truck is back at the hub
+        """
+        self.graph = graph
+        self.hub_location = hub_location
+        self.speed = speed
+
+    def build_customers(self, packages, capacity):
+        """
+        groups packages by destination and splits destinations with more packages than capacity
+        :return: a tuple of the customer locations and the packages of each customer, index 0 is the hub
+        """
+        by_location = {}
+        for package in packages:
+            by_location.setdefault(package.location, []).append(package)
+        locations = [self.hub_location]
+        customer_packages = [[]]
+        for location in sorted(by_location, key=lambda x: x.address):
+            location_packages = sorted(by_location[location], key=lambda p: p.id)
+            for i in range(0, len(location_packages), capacity):
+                locations.append(location)
+                customer_packages.append(location_packages[i:i + capacity])
+        return locations, customer_packages
+
+    def solve(self, packages, trucks):
+        """
+        plans routes for packages over trucks
+        :param packages: packages at the hub to deliver
+        :param trucks: trucks to deliver with, each starts at its current time
+        :return: a dict of truck to its list of trips in departure order, each trip a tuple of its route (locations
+        visited after the hub) and the packages to load for it
+        """
+        capacity = min(truck.get_limit() for truck in trucks)
+        locations, customer_packages = self.build_customers(packages, capacity)
+        demand = [len(p) for p in customer_packages]
+        distances = [[self.graph.get_distance(a, b) if a is not b else 0 for b in locations] for a in locations]
+
+        routes = self.savings(distances, demand, capacity)
+        self.exchange(routes, distances, demand, capacity)
+
+        improver = RouteImprover(self.graph, self.hub_location, self.hub_location)
+        trips = []
+        for route in routes:
+            order = improver.improve([locations[c] for c in route])
+            # improve only reorders locations, map them back to their customers
+            remaining = {}
+            for c in route:
+                remaining.setdefault(locations[c], []).append(c)
+            trip_packages = [package for location in order for package in customer_packages[remaining[location].pop()]]
+            trips.append((order, improver.route_distance(order), trip_packages))
+        return self.assign(trips, trucks)
+
+    @staticmethod
+    def savings(distances, demand, capacity):
+        """
+        Clarke-Wright savings construction
+        :return: list of routes, each a list of customer indices
+        """
+        n = len(demand)
+        routes = {c: [c] for c in range(1, n)}
+        route_of = list(range(n))
+        load = {c: demand[c] for c in range(1, n)}
+        savings = sorted(((distances[0][i] + distances[0][j] - distances[i][j], i, j)
+                          for i in range(1, n) for j in range(i + 1, n)), reverse=True)
+        for saving, i, j in savings:
+            if saving <= 0:
+                break
+            a, b = route_of[i], route_of[j]
+            if a == b or load[a] + load[b] > capacity:
+                continue
+            route_a, route_b = routes[a], routes[b]
+            # i has to end route_a and j has to start route_b, distances are symmetric so routes can be reversed
+            if route_a[-1] != i:
+                if route_a[0] != i:
+                    continue
+                route_a.reverse()
+            if route_b[0] != j:
+                if route_b[-1] != j:
+                    continue
+                route_b.reverse()
+            route_a.extend(route_b)
+            load[a] += load.pop(b)
+            for c in routes.pop(b):
+                route_of[c] = a
+        return list(routes.values())
+
+    @staticmethod
+    def exchange(routes, distances, demand, capacity):
+        """
+        inter-route relocate and swap moves, applied in place until a full pass finds no improvement
+        :return: None
+        """
+        loads = [sum(demand[c] for c in route) for route in routes]
+
+        def neighbours(route, p):
+            return route[p - 1] if p > 0 else 0, route[p + 1] if p + 1 < len(route) else 0
+
+        improved = True
+        while improved:
+            improved = False
+            for a, route_a in enumerate(routes):
+                p = 0
+                while p < len(route_a):
+                    c = route_a[p]
+                    before, after = neighbours(route_a, p)
+                    removal_gain = distances[before][c] + distances[c][after] - distances[before][after]
+                    move = None
+                    best_delta = -1e-9
+                    for b, route_b in enumerate(routes):
+                        if b == a:
+                            continue
+                        if loads[b] + demand[c] <= capacity:
+                            # relocate c between positions q - 1 and q of route_b
+                            for q in range(len(route_b) + 1):
+                                x = route_b[q - 1] if q > 0 else 0
+                                y = route_b[q] if q < len(route_b) else 0
+                                delta = distances[x][c] + distances[c][y] - distances[x][y] - removal_gain
+                                if delta < best_delta:
+                                    best_delta, move = delta, ('relocate', b, q)
+                        for q, e in enumerate(route_b):
+                            if loads[a] - demand[c] + demand[e] > capacity or \
+                                    loads[b] - demand[e] + demand[c] > capacity:
+                                continue
+                            x, y = neighbours(route_b, q)
+                            delta = (distances[before][e] + distances[e][after] - distances[before][c]
+                                     - distances[c][after] + distances[x][c] + distances[c][y] - distances[x][e]
+                                     - distances[e][y])
+                            if delta < best_delta:
+                                best_delta, move = delta, ('swap', b, q)
+                    if move is None:
+                        p += 1
+                        continue
+                    kind, b, q = move
+                    route_b = routes[b]
+                    if kind == 'relocate':
+                        del route_a[p]
+                        route_b.insert(q, c)
+                        loads[a] -= demand[c]
+                        loads[b] += demand[c]
+                    else:
+                        e = route_b[q]
+                        route_a[p], route_b[q] = e, c
+                        loads[a] += demand[e] - demand[c]
+                        loads[b] += demand[c] - demand[e]
+                        p += 1
+                    improved = True
+        routes[:] = [route for route in routes if route]
+
+    def assign(self, trips, trucks):
+        """
+        hands trips out longest first to the truck that is back at the hub earliest
+        :param trips: list of (route, distance, packages) tuples
+        :param trucks: trucks to assign to
+        :return: a dict of truck to its list of (route, packages) trips in departure order
+        """
+        available = {truck: truck.get_time() for truck in trucks}
+        plan = {truck: [] for truck in trucks}
+        for route, distance, trip_packages in sorted(trips, key=lambda trip: trip[1], reverse=True):
+            truck = min(trucks, key=lambda t: available[t])
+            plan[truck].append((route, trip_packages))
+            available[truck] += timedelta(hours=distance / self.speed)
+        return plan
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import numpy as np
+from DestinationGraph import DestinationGraph
+from DestinationGraph import Location
+from DistanceMatrix import DistanceMatrix
+
+
+class GraphCache:
+    """
+    Persists a parsed DestinationGraph to disk so it does not have to be rebuilt from its source csv on every start
+
+    Each compiled graph is stored as two files in cache_dir named after the source file:
+        <name>.graph.json holds the checksum of the source file and the address, zip and name of every location in
+        matrix order
+        <name>.graph.npy holds the distance matrix, which is memory mapped read only when loaded so several worker
+        processes share one copy of it
+
+    The cache is keyed by a sha256 of the source file and is rebuilt only when that file changes.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, cache_dir):
+        """
+        :param cache_dir: directory the compiled graphs are stored in, created when first written to
+        """
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def checksum(file_path):
+        """
+        :param file_path: file to hash
+        :return: hex sha256 digest of the file contents
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as source_file:
+            for block in iter(lambda: source_file.read(1 << 16), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get_paths(self, file_path):
+        """
+        :param file_path: source file of the graph
+        :return: a tuple of the metadata path and the matrix path for file_path
+        """
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        base = os.path.join(self.cache_dir, name + '.graph')
+        return base + '.json', base + '.npy'
+
+    def load_graph(self, file_path, build_graph):
+        """
+        returns the graph for file_path from the cache, or builds and caches it if the cache is missing or stale
+        :param file_path: source file of the graph
+        :param build_graph: function taking file_path and returning a parsed DestinationGraph, only called on a miss
+        :return: DestinationGraph with its distance matrix already attached, a cached graph is backed by the memory
+        mapped matrix alone until its adjacency_list or edge_weights are used
+        """
+        checksum = self.checksum(file_path)
+        graph = self.read(file_path, checksum)
+        if graph is None:
+            graph = build_graph(file_path)
+            self.write(file_path, checksum, graph)
+        return graph
+
+    def read(self, file_path, checksum):
+        """
+        reads a compiled graph
+        :param file_path: source file of the graph
+        :param checksum: expected checksum of the source file
+        :return: DestinationGraph or None if there is no usable compiled graph for checksum
+        """
+        meta_path, matrix_path = self.get_paths(file_path)
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            if meta.get('version') != self.FORMAT_VERSION or meta.get('checksum') != checksum:
+                return None
+            matrix = np.load(matrix_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        locations = [Location(address, zipcode, name) for address, zipcode, name in meta['locations']]
+        if matrix.shape != (len(locations), len(locations)):
+            return None
+        # the memory mapped matrix backs the graph, its dicts are only built if a caller asks for them
+        return DestinationGraph.from_distance_matrix(DistanceMatrix(locations, matrix))
+
+    def write(self, file_path, checksum, graph):
+        """
+        compiles graph and stores it in cache_dir, files are written to a temporary name first and then moved into
+        place so a reader never sees a partially written graph
+        :param file_path: source file of the graph
+        :param checksum: checksum of the source file
+        :param graph: DestinationGraph parsed from file_path
+        :return: None
+        """
+        meta_path, matrix_path = self.get_paths(file_path)
+        distance_matrix = graph.get_distance_matrix()
+        meta = {
+            'version': self.FORMAT_VERSION,
+            'checksum': checksum,
+            'locations': [[location.address, location.zip, location.name] for location in distance_matrix.locations],
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_suffix = '.%s.tmp' % os.getpid()
+        with open(matrix_path + temp_suffix, 'wb') as matrix_file:
+            np.save(matrix_file, distance_matrix.matrix)
+        with open(meta_path + temp_suffix, 'w') as meta_file:
+            json.dump(meta, meta_file)
+        # matrix first, the metadata holding the checksum is what marks the compiled graph as valid
+        os.replace(matrix_path + temp_suffix, matrix_path)
+        os.replace(meta_path + temp_suffix, meta_path)
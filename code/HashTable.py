@@ -1,25 +1,26 @@
-from Package import Package
+from array import array
+from MetricsRegistry import metrics
 
-
-class Empty:
-    """
-    class type to represent an empty bucket
-    """
-    pass
+# key array markers, item ids are non negative so they never collide with these
+EMPTY_SINCE_START = -1
+EMPTY_AFTER_REMOVAL = -2
 
 
 class HashTable:
     """
-    Creates a Quadratic chaining hash table.
+    Creates an open addressing hash table keyed by integer item ids, using quadratic probing.
 
-    First creates an Empty object that will be used to delineate between 'empty since start' and 'empty due to removal'
-    types which will be using in collision avoidance.
+    Keys and items are kept in two parallel arrays: keys is a typed array of ids, data holds the item stored for the
+    key at the same index. Probing only reads keys, so lookups compare plain integers and never touch the items.
+    Slots in keys are either an id, EMPTY_SINCE_START or EMPTY_AFTER_REMOVAL (a tombstone). Probing stops at the
+    matching id or the first slot that has been empty since start.
 
     Defaults to a linear search if both c1 and c2 are not specified or set to 0.
 
-    For all insert, search, and remove methods, the worst case complexity is O(N) which happen be when all of the
-    buckets are occupied resulting in collisions occurring. This hashtable will almost always run at O(1) since it
-    automatically resizes at a set capacity and uses a quadratic chaining algorithm to further reduce collisions.
+    The table doubles its capacity when more than half of it is in use (items plus tombstones) and is rebuilt in place
+    when tombstones make up more than a quarter of it, so probe sequences stay short and insert, search and remove run
+    in O(1) on average. The worst case is O(N) when every probed bucket collides. While metrics are enabled, probe
+    lengths are recorded for inspection with probe_statistics().
     """
 
     def __init__(self, capacity=20, c1=0, c2=0):
@@ -28,13 +29,19 @@ class HashTable:
         :param c1: first constant in quadratic hash function
         :param c2: second constant in quadratic hash function
         """
+        if c1 == 0 and c2 == 0:
+            c1 = 1
         self.c1 = c1
         self.c2 = c2
-        self.EMPTY_SINCE_START = Empty()
-        self.EMPTY_AFTER_REMOVAL = Empty()
-        # init table to an empty since start bucket array
-        self.data = [self.EMPTY_SINCE_START] * capacity
+        self.EMPTY_SINCE_START = EMPTY_SINCE_START
+        self.EMPTY_AFTER_REMOVAL = EMPTY_AFTER_REMOVAL
+        self.keys = array('q', [EMPTY_SINCE_START]) * capacity
+        self.data = [None] * capacity
         self.occupied_buckets = 0
+        self.removed_buckets = 0
+        # probe_lengths[n] counts the inserts, searches and removes that looked at n + 1 buckets while metrics were
+        # enabled
+        self.probe_lengths = [0]
 
     # implements quadratic search algo
     def quadratic_hash(self, item_id, searched_buckets):
@@ -44,96 +51,188 @@ class HashTable:
         :param searched_buckets: number of previously searched buckets
         :return: hash value result from function
         """
-        hashed = (hash(item_id) + self.c1 * searched_buckets + self.c2 * searched_buckets ** 2) % len(self.data)
+        hashed = (hash(item_id) + self.c1 * searched_buckets + self.c2 * searched_buckets ** 2) % len(self.keys)
         return hashed
 
-    def check_capacity(self):
+    def record_probe(self, searched_buckets):
         """
-        checks the amount of occupied buckets, if it is greater than 50% of total capacity, the table is resized to
-        twice its previous capacity
+        counts one lookup that looked at searched_buckets + 1 buckets, only called while metrics are enabled
         :return: None
         """
-        if self.occupied_buckets > len(self.data) * .50:
-            temp = self.data
-            self.data = [self.EMPTY_SINCE_START] * (len(self.data) * 2)
-            item: Package
-            for item in filter(lambda x: type(x) is not Empty, temp):
-                self.insert(item)
+        if searched_buckets >= len(self.probe_lengths):
+            self.probe_lengths.extend([0] * (searched_buckets + 1 - len(self.probe_lengths)))
+        self.probe_lengths[searched_buckets] += 1
+        metrics.observe('hashtable_probe_length', searched_buckets + 1)
 
-    def insert(self, item):
+    def find_bucket(self, item_id):
         """
-        Searches for a bucket that is empty and inserts item if found
-        if bucket was occupied, search continues until an empty bucket is found or all items have been searched.
-        After item is inserted into empty bucket, the occupied_buckets count is incremented and check_capacity() is
-        :param item: item to search for
-        :return: found item
+        walks the probe sequence of item_id until it finds item_id or a bucket that has been empty since start
+        :param item_id: id to look for
+        :return: a tuple of the bucket holding item_id (or None) and the first bucket item_id could be inserted into
+        (or None if the table is full)
         """
+        keys = self.keys
+        capacity = len(keys)
+        recording = metrics.enabled
+        first_free = None
         searched_buckets = 0
-        item_id = item.id
-        while searched_buckets < len(self.data):
+        while searched_buckets < capacity:
             current_bucket = self.quadratic_hash(item_id, searched_buckets)
-            if type(self.data[current_bucket]) is Empty:
-                # bucket was empty therefore we can store our item in it
-                self.data[current_bucket] = item
-                self.occupied_buckets += 1
-                self.check_capacity()
-                return True
-            # bucket was not empty, will continue searching for next bucket sequence
+            key = keys[current_bucket]
+            if key == item_id:
+                if recording:
+                    self.record_probe(searched_buckets)
+                return current_bucket, current_bucket
+            if key == EMPTY_SINCE_START:
+                if recording:
+                    self.record_probe(searched_buckets)
+                return None, current_bucket if first_free is None else first_free
+            if key == EMPTY_AFTER_REMOVAL and first_free is None:
+                first_free = current_bucket
             searched_buckets += 1
-        # table "data" is at its limit
-        return False
+        if recording:
+            self.record_probe(searched_buckets - 1)
+        return None, first_free
 
-    def search(self, item_id):
+    def resize(self, capacity):
         """
-        Searches and removes bucket that matches item
-        if bucket was occupied or empty due to removal, search continues until item is found, all items are searched,
-        or a bucket is encountered that is empty since start.
-        :param item_id: id of item to search for
-        :return: found item or None
+        rebuilds the table with the given capacity, dropping every tombstone
+        :param capacity: the new capacity
+        :return: None
         """
+        if metrics.enabled:
+            metrics.increment('hashtable_resizes_total')
+        items = [item for item in self.data if item is not None]
+        self.keys = array('q', [EMPTY_SINCE_START]) * capacity
+        self.data = [None] * capacity
+        self.occupied_buckets = 0
+        self.removed_buckets = 0
+        for item in items:
+            self.place(item)
 
-        searched_buckets = 0
-        current_bucket = self.quadratic_hash(item_id, searched_buckets)
-        found = None
-        while searched_buckets < len(self.data) and self.data[current_bucket] is not self.EMPTY_SINCE_START:
-            if type(current_bucket) is not Empty and self.data[current_bucket].id == item_id:
-                found = self.data[current_bucket]
+    def place(self, item):
+        """
+        stores item without checking capacity, used while rebuilding and bulk loading
+        :param item: item to store
+        :return: True if stored, False if the table is full
+        """
+        item_id = item.id
+        if item_id < 0:
+            raise ValueError(str('item ids must not be negative, got %s' % item_id))
+        found, free = self.find_bucket(item_id)
+        if found is not None:
+            self.data[found] = item
+            return True
+        if free is None:
+            return False
+        if self.keys[free] == EMPTY_AFTER_REMOVAL:
+            self.removed_buckets -= 1
+        self.keys[free] = item_id
+        self.data[free] = item
+        self.occupied_buckets += 1
+        return True
 
-            current_bucket = self.quadratic_hash(item_id, searched_buckets)
-            searched_buckets += 1
+    def check_capacity(self):
+        """
+        checks the amount of used buckets, if items and tombstones take more than 50% of total capacity, the table is
+        resized to twice its previous capacity. If tombstones alone take more than 25% the table is rebuilt at its
+        current capacity instead
+        :return: None
+        """
+        if self.removed_buckets > len(self.keys) * .25:
+            self.resize(len(self.keys))
+        if self.occupied_buckets + self.removed_buckets > len(self.keys) * .50:
+            self.resize(len(self.keys) * 2)
+
+    def insert(self, item):
+        """
+        Searches for item's id and replaces the stored item if found, otherwise stores item in the first empty or
+        removed bucket on its probe sequence.
+        After item is inserted into an empty bucket, the occupied_buckets count is incremented and check_capacity() is
+        called
+        :param item: item to insert
+        :return: True if stored, False if the table is full
+        """
+        stored = self.place(item)
+        self.check_capacity()
+        return stored
 
-        return found
+    def bulk_insert(self, items):
+        """
+        inserts many items at once, the table is sized for all of them up front so it is resized at most once
+        :param items: iterable of items
+        :return: number of items inserted
+        """
+        items = list(items)
+        capacity = len(self.keys)
+        while (self.occupied_buckets + len(items)) > capacity * .50:
+            capacity *= 2
+        if capacity != len(self.keys) or self.removed_buckets:
+            self.resize(capacity)
+        inserted = 0
+        for item in items:
+            inserted += self.place(item)
+        return inserted
+
+    def search(self, item_id):
+        """
+        Searches for the bucket that matches item_id
+        if bucket was occupied by another id or empty due to removal, search continues until item is found, all items
+        are searched, or a bucket is encountered that is empty since start.
+        :param item_id: id of item to search for
+        :return: found item or None
+        """
+        found = self.find_bucket(item_id)[0]
+        if found is None:
+            return None
+        return self.data[found]
 
     def remove(self, item_id):
         """
         Searches and removes bucket that matches item
         if bucket was occupied or empty due to removal, search continues until item is found, all items are searched,
         or a bucket is encountered that is empty since start.
-        Once desired item is found, it is removed and the occupied_buckets counter is decremented.
+        Once desired item is found, its bucket is marked empty after removal, the occupied_buckets counter is
+        decremented and the table is compacted if tombstones have built up.
         :param item_id: id of item to remove
-        :return: None
+        :return: removed item or None
         """
-        searched_buckets = 0
-        current_bucket = self.quadratic_hash(item_id, searched_buckets)
-
-        while searched_buckets < len(self.data) and self.data[current_bucket] is not self.EMPTY_SINCE_START:
-            current_bucket = self.quadratic_hash(item_id, searched_buckets)
-
-            if self.data[current_bucket] == item_id:
-                self.data[current_bucket] = self.EMPTY_AFTER_REMOVAL
-                self.occupied_buckets -= 1
+        found = self.find_bucket(item_id)[0]
+        if found is None:
+            return None
+        item = self.data[found]
+        self.keys[found] = EMPTY_AFTER_REMOVAL
+        self.data[found] = None
+        self.occupied_buckets -= 1
+        self.removed_buckets += 1
+        self.check_capacity()
+        return item
 
-            current_bucket = self.quadratic_hash(item_id, searched_buckets)
-            searched_buckets += 1
+    def probe_statistics(self):
+        """
+        :return: a dict of lookup count, mean and max probe length (buckets looked at per lookup) and a histogram of
+        probe lengths mapping length to count, counting only the lookups made while metrics were enabled
+        """
+        lookups = sum(self.probe_lengths)
+        histogram = {length + 1: count for length, count in enumerate(self.probe_lengths) if count}
+        return {
+            'lookups': lookups,
+            'mean_probe_length': sum(length * count for length, count in histogram.items()) / lookups if lookups else 0,
+            'max_probe_length': max(histogram, default=0),
+            'histogram': histogram,
+            'capacity': len(self.keys),
+            'occupied': self.occupied_buckets,
+            'removed': self.removed_buckets,
+        }
 
     def filter_packages(self, function):
         """
         filters data in hash_table based on function
-        first removes Empty items that are used only for hash table functionality
+        first removes empty buckets that are used only for hash table functionality
         :param function: function to filter data
         :return: filtered data as list
         """
-        non_empty_buckets = filter(lambda x: type(x) is not Empty, self.data)
+        non_empty_buckets = filter(lambda x: x is not None, self.data)
         return list(filter(function, non_empty_buckets))
 
     def get_all_packages(self):
@@ -142,20 +241,20 @@ class HashTable:
         """
         return self.filter_packages(lambda x: x)
 
+    def __len__(self):
+        return self.occupied_buckets
+
     def __str__(self):
         """
         converts string representation to something human readable
         """
-        i = 0
         spacer = '___________\n'
-        for item in self.data:
-            s = str(item)
-            if item is self.EMPTY_AFTER_REMOVAL:
+        for i, key in enumerate(self.keys):
+            s = str(self.data[i])
+            if key == EMPTY_AFTER_REMOVAL:
                 s = 'Empty after removal'
-            elif item is self.EMPTY_SINCE_START:
+            elif key == EMPTY_SINCE_START:
                 s = 'Empty since start'
-            # spacer += "%s %s % (i, s)"
             spacer += "%2d:|   ---|-->%s\n" % (i, s)
-            i += 1
         spacer += '____________'
         return spacer
@@ -0,0 +1,148 @@
+import numpy as np
+from PathFinderAlgorithm import PathFinderAlgorithm
+
+
+class HeldKarpSolver:
+    """
+    Exact route solver using the Held-Karp bitmask dynamic program
+
+    cost[mask][k] is the length of the shortest route that leaves start_location, visits exactly the stops in mask and
+    ends at stop k. Routes are extended one stop at a time, and every subset of the same size is processed together as
+    one NumPy operation per stop, so the Python loop only runs O(N^2) times while the work is O(2^N * N^2).
+    Memory is O(2^N * N), about 9MB at 16 stops.
+
+    Legs use shortest path distances from PathFinderAlgorithm, so the returned route includes any locations passed
+    through between stops, matching the routes built by find_solution.
+
+    With a RouteTiming, every state also carries its driving time, rounded per leg the way RouteTiming and TimeKeeper
+    round it, and states that reach their stop after its latest time are pruned as soon as they are built. Any route
+    returned after pruning is on time. Only the shortest route to each state is kept, so a longer route to the same
+    state that would have arrived earlier is dropped. The result is therefore the shortest route among those kept, not
+    necessarily the shortest on time route, and pruning can miss an on time route altogether. Earliest times are not
+    used for pruning. If no kept route is on time the unpruned optimum is returned.
+    """
+
+    def __init__(self, graph, start_location, end_location=None, max_stops=16, timing=None):
+        """
+        :param graph: the graph to route on
+        :param start_location: the fixed first location of the route
+        :param end_location: optional fixed final location, makes the route a closed tour
+        :param max_stops: largest number of unique stops solved exactly, memory and time double with every stop
+        :param timing: optional RouteTiming whose latest times the route has to meet
+        """
+        self.graph = graph
+        self.start_location = start_location
+        self.end_location = end_location
+        self.max_stops = max_stops
+        self.timing = timing
+
+    def can_solve(self, locations):
+        """
+        :param locations: locations to visit
+        :return: True if the number of unique stops is within max_stops
+        """
+        return len(set(locations) - {self.start_location}) <= self.max_stops
+
+    def solve(self, locations, prune=True):
+        """
+        finds the shortest route visiting every location
+        :param locations: locations to visit
+        :param prune: prune states that miss a latest time when a timing is set
+        :return: a tuple of the route as a list of locations visited after start_location, and its total distance, which
+        includes the leg to end_location for closed tours although that leg is left for the caller to drive
+        """
+        stops = sorted(set(locations) - {self.start_location}, key=lambda x: x.address)
+        if len(stops) > self.max_stops:
+            raise ValueError(str('%s stops is more than the %s the exact solver is limited to' % (
+                len(stops), self.max_stops)))
+        targets = list(stops)
+        if self.end_location is not None:
+            targets.append(self.end_location)
+        trees = {origin: PathFinderAlgorithm(self.graph, origin, locations=targets)
+                 for origin in [self.start_location] + stops}
+        if not stops:
+            return [], trees[self.start_location].distances.get(self.end_location, 0)
+
+        n = len(stops)
+        # leg[j][k] is the shortest distance from stop j to stop k
+        leg = np.array([[trees[a].distances.get(b, np.inf) for b in stops] for a in stops], dtype=np.float64)
+        first_leg = np.array([trees[self.start_location].distances.get(b, np.inf) for b in stops], dtype=np.float64)
+        if self.end_location is not None:
+            last_leg = np.array([trees[a].distances.get(self.end_location, np.inf) for a in stops], dtype=np.float64)
+        else:
+            last_leg = np.zeros(n, dtype=np.float64)
+
+        pruning = prune and self.timing is not None
+        if pruning:
+            # latest[k] is the number of minutes after the start by which stop k has to be reached, minutes[j][k] the
+            # rounded driving time of the shortest path from j to k
+            latest = np.full(n, np.inf, dtype=np.float64)
+            for k, stop in enumerate(stops):
+                window = self.timing.windows.get(stop)
+                if window is not None and window[1] is not None:
+                    latest[k] = (window[1] - self.timing.start_time).total_seconds() / 60
+            minutes = np.array([[self.path_minutes(trees[a], b) for b in stops] for a in stops], dtype=np.float64)
+            first_minutes = np.array([self.path_minutes(trees[self.start_location], b) for b in stops],
+                                     dtype=np.float64)
+            first_leg = np.where(first_minutes <= latest, first_leg, np.inf)
+            elapsed = np.zeros((1 << n, n), dtype=np.float64)
+            elapsed[1 << np.arange(n), np.arange(n)] = first_minutes
+
+        cost = np.full((1 << n, n), np.inf, dtype=np.float64)
+        parent = np.full((1 << n, n), -1, dtype=np.int8)
+        singles = 1 << np.arange(n)
+        cost[singles, np.arange(n)] = first_leg
+
+        masks = np.arange(1 << n)
+        popcount = np.zeros(1 << n, dtype=np.int8)
+        for k in range(n):
+            popcount += (masks >> k) & 1
+
+        for size in range(1, n):
+            layer = masks[popcount == size]
+            # extended[m][j][k] is the route over layer[m] ending at stop j followed by the leg from j to k, best[m][k]
+            # keeps the cheapest j
+            extended = cost[layer][:, :, None] + leg[None, :, :]
+            best_from = extended.argmin(axis=1)
+            best = np.take_along_axis(extended, best_from[:, None, :], axis=1)[:, 0, :]
+            if pruning:
+                best_elapsed = np.take_along_axis(elapsed[layer], best_from, axis=1) + minutes[best_from, np.arange(n)]
+                best[best_elapsed > latest[None, :]] = np.inf
+            for k in range(n):
+                outside = (layer & (1 << k)) == 0
+                extended_masks = layer[outside] | (1 << k)
+                cost[extended_masks, k] = best[outside, k]
+                parent[extended_masks, k] = best_from[outside, k]
+                if pruning:
+                    elapsed[extended_masks, k] = best_elapsed[outside, k]
+
+        full = (1 << n) - 1
+        totals = cost[full] + last_leg
+        if not np.isfinite(totals).any() and pruning:
+            return self.solve(locations, prune=False)
+        k = int(totals.argmin())
+        order = []
+        mask = full
+        while k >= 0:
+            order.append(stops[k])
+            previous = int(parent[mask, k])
+            mask &= ~(1 << k)
+            k = previous
+        order.reverse()
+
+        # replaces each leg with its shortest path
+        route = []
+        current_location = self.start_location
+        for stop in order:
+            route.extend(trees[current_location].calculate_path(stop)[0][1:])
+            current_location = stop
+        return route, float(totals.min())
+
+    def path_minutes(self, tree, destination):
+        """
+        :param tree: shortest path tree to take the path from
+        :param destination: end of the path
+        :return: driving minutes along the path, each leg rounded the way RouteTiming rounds it
+        """
+        path = tree.calculate_path(destination)[0]
+        return sum(self.timing.leg_minutes(path[i], path[i + 1]) for i in range(len(path) - 1))
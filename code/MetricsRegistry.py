@@ -0,0 +1,221 @@
+import json
+import time as clock
+from bisect import bisect_left
+
+# upper bounds of the default histogram buckets, timers are in seconds
+TIMER_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64, 128, 256, 512, 1024)
+
+
+class Histogram:
+    """
+    Counts observations into buckets by upper bound, plus their count and sum
+    counts[i] holds the observations no larger than bounds[i] and larger than the bound before it, the last count holds
+    everything above the largest bound.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        :return: a list of (upper bound, observations no larger than it) ending with ('+Inf', count), the Prometheus
+        bucket layout
+        """
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+
+class Timer:
+    """
+    context manager observing the seconds spent in its block into a histogram of the registry
+    """
+
+    __slots__ = ('registry', 'name', 'started')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = clock.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, clock.perf_counter() - self.started, TIMER_BUCKETS)
+        return False
+
+
+class NullTimer:
+    """
+    stands in for Timer while the registry is disabled
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms for the hot paths of planning and delivery
+
+    The registry starts disabled. Instrumented code checks enabled before recording anything, so a disabled registry
+    costs one attribute lookup per call site and nothing is allocated. Metrics are created the first time they are
+    recorded:
+        increment(name)         counter, a running total
+        observe(name, value)    histogram of values, e.g. probe lengths or stops per route
+        timer(name)             context manager observing the seconds its block took into a histogram
+    Only the process the registry lives in is measured, find_solution's pool workers record into registries of their
+    own. Snapshots are exported with to_dict()/to_json() or in the Prometheus text format with to_prometheus().
+
+    The instrumented modules share the module level registry metrics:
+        from MetricsRegistry import metrics
+        metrics.enable()
+        ... plan and dispatch ...
+        print(metrics.to_prometheus())
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self.descriptions = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """
+        drops every recorded value, descriptions are kept
+        :return: None
+        """
+        self.counters.clear()
+        self.histograms.clear()
+
+    def describe(self, name, description):
+        """
+        :param name: metric name
+        :param description: one line help text, exported as the Prometheus HELP line
+        :return: None
+        """
+        self.descriptions[name] = description
+
+    def increment(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value, buckets=COUNT_BUCKETS):
+        """
+        :param name: histogram name
+        :param value: observed value
+        :param buckets: upper bounds of the buckets, only used when the histogram is created by this call
+        :return: None
+        """
+        if self.enabled:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def timer(self, name):
+        """
+        :param name: histogram name, by convention ending in _seconds
+        :return: a context manager timing its block, a shared no op while disabled
+        """
+        if self.enabled:
+            return Timer(self, name)
+        return NULL_TIMER
+
+    def to_dict(self):
+        """
+        :return: a JSON serializable dict of every counter and histogram, histogram buckets are cumulative
+        """
+        return {
+            'counters': dict(self.counters),
+            'histograms': {name: {'count': histogram.count, 'sum': histogram.sum,
+                                  'buckets': [[bound, count] for bound, count in histogram.cumulative()]}
+                           for name, histogram in self.histograms.items()},
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix='wgups_'):
+        """
+        :param prefix: prepended to every metric name
+        :return: every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for name in sorted(self.counters):
+            lines.extend(self.header(prefix + name, name, 'counter'))
+            lines.append('%s%s %s' % (prefix, name, self.counters[name]))
+        for name in sorted(self.histograms):
+            histogram = self.histograms[name]
+            lines.extend(self.header(prefix + name, name, 'histogram'))
+            for bound, count in histogram.cumulative():
+                lines.append('%s%s_bucket{le="%s"} %s' % (prefix, name, bound, count))
+            lines.append('%s%s_sum %s' % (prefix, name, histogram.sum))
+            lines.append('%s%s_count %s' % (prefix, name, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def header(self, full_name, name, kind):
+        if name in self.descriptions:
+            yield '# HELP %s %s' % (full_name, self.descriptions[name])
+        yield '# TYPE %s %s' % (full_name, kind)
+
+    def write(self, file_path):
+        """
+        writes the metrics to file_path, in the Prometheus text format for a .prom file and as JSON otherwise
+        :param file_path: file to write
+        :return: None
+        """
+        with open(file_path, 'w') as metrics_file:
+            metrics_file.write(self.to_prometheus() if file_path.endswith('.prom') else self.to_json())
+
+
+# registry shared by the instrumented modules
+metrics = MetricsRegistry()
+metrics.describe('pathfinder_runs_total', 'Dijkstra runs, one per PathFinderAlgorithm built')
+metrics.describe('pathfinder_settled_locations', 'locations settled by a Dijkstra run')
+metrics.describe('pathfinder_seconds', 'time spent in a Dijkstra run')
+metrics.describe('solver_restarts_total', 'random restarts sampled by find_solution')
+metrics.describe('solver_abandoned_restarts_total', 'restarts abandoned for missing a delivery window')
+metrics.describe('solver_improvements_total', 'restarts that found a shorter route than every restart before them')
+metrics.describe('solver_best_restart', 'restart number the returned route was found at')
+metrics.describe('solver_seconds', 'time spent in find_solution')
+metrics.describe('route_solves_total', 'routes planned by determine_solution, with any solver')
+metrics.describe('route_stops', 'stops on a route planned by determine_solution')
+metrics.describe('route_solve_seconds', 'time spent planning a route in determine_solution')
+metrics.describe('solution_cache_hits_total', 'routes served from a SolutionCache')
+metrics.describe('solution_cache_misses_total', 'SolutionCache lookups that had to solve the route')
+metrics.describe('hashtable_probe_length', 'buckets looked at per hash table insert, search or remove')
+metrics.describe('hashtable_resizes_total', 'hash table rebuilds, growing or compacting')
+metrics.describe('truck_stops_total', 'delivery stops made by trucks')
+metrics.describe('truck_deliveries_total', 'packages delivered by trucks')
+metrics.describe('truck_packages_per_stop', 'packages handed over at a delivery stop')
@@ -27,6 +27,8 @@ class Package:
         self.delivery_time = None
         self.transit_time = None
         self.truck = None
+        # objects told about status changes through package_status_changed(package, old_status)
+        self.listeners = []
 
     def __str__(self):
         """
@@ -40,17 +42,32 @@ class Package:
     def set_truck(self, truck):
         self.truck = truck
 
-    def set_delivered(self, time):
-        self.status = PackageStatus.DELIVERED
+    def add_listener(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def set_status(self, status, time):
+        """
+        changes status and tells every listener, the set_ methods below go through here
+        """
+        old_status = self.status
+        self.status = status
         self.status_time = time
+        for listener in self.listeners:
+            listener.package_status_changed(self, old_status)
+
+    def set_delivered(self, time):
         self.delivery_time = time
+        self.set_status(PackageStatus.DELIVERED, time)
 
     def set_in_transit(self, time):
-        self.status = PackageStatus.IN_TRANSIT
-        self.status_time = time
         self.transit_time = time
+        self.set_status(PackageStatus.IN_TRANSIT, time)
 
     def set_at_hub(self, time):
-        self.status = PackageStatus.AT_HUB
-        self.status_time = time
         self.hub_time = time
+        self.set_status(PackageStatus.AT_HUB, time)
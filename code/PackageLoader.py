@@ -0,0 +1,106 @@
+import csv
+from datetime import datetime
+from itertools import islice
+from Package import Package
+
+
+class PackageLoader:
+    """
+    Streams a package file into a package table in fixed size chunks
+
+    The file is read lazily, chunk_size rows at a time, and every stage is a generator, so only one chunk of rows and
+    packages is held in memory however long the file is, the address resolver's memo and the deadline cache are bounded
+    as well:
+        read_chunks     lists of raw csv rows, header and blank rows skipped
+        build_packages  lists of Package, the chunk's addresses resolved in one resolve_many call and deadlines parsed
+                        once per distinct string
+        load            bulk inserts each chunk into the table and yields it, so callers can start working on the
+                        packages read so far before the rest of the file is
+    """
+
+    FIELDNAMES = ['id', 'address', 'city', 'state', 'zip', 'deadline', 'weight', 'notes']
+    MAX_CACHED_DEADLINES = 1024
+
+    def __init__(self, address_resolver, current_time, chunk_size=4096):
+        """
+        :param address_resolver: AddressResolver used to turn addresses into locations
+        :param current_time: time the packages arrive at the hub
+        :param chunk_size: number of rows read per chunk
+        """
+        self.address_resolver = address_resolver
+        self.current_time = current_time
+        self.chunk_size = chunk_size
+        self.deadlines = {}
+
+    @staticmethod
+    def deadline_from_text(deadline):
+        """
+        :param deadline: deadline as written in the package file, EOD and missing deadlines are 6 PM
+        :return: datetime
+        """
+        if deadline == "EOD" or deadline is None:
+            deadline = '06:00 PM'
+        return datetime.strptime(deadline, '%I:%M %p')
+
+    def parse_deadline(self, deadline):
+        """
+        parses a deadline, EOD and missing deadlines are 6 PM. Results are cached per distinct string, the cache is
+        emptied once it holds MAX_CACHED_DEADLINES of them
+        :param deadline: deadline as written in the package file
+        :return: datetime
+        """
+        parsed = self.deadlines.get(deadline)
+        if parsed is None:
+            parsed = self.deadline_from_text(deadline)
+            if len(self.deadlines) >= self.MAX_CACHED_DEADLINES:
+                self.deadlines.clear()
+            self.deadlines[deadline] = parsed
+        return parsed
+
+    def read_chunks(self, package_file):
+        """
+        :param package_file: open package file
+        :return: generator of lists of at most chunk_size row dicts
+        """
+        rows = csv.DictReader(package_file, delimiter=',', fieldnames=self.FIELDNAMES, skipinitialspace=True)
+        rows = (row for row in rows if row.get('id') and row.get('id').isnumeric())
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def build_packages(self, chunks):
+        """
+        :param chunks: iterable of lists of row dicts
+        :return: generator of lists of Package, one per chunk
+        """
+        for chunk in chunks:
+            locations = self.address_resolver.resolve_many([row.get('address') for row in chunk])
+            yield [Package(int(row.get('id')),
+                           location,
+                           row.get('city'),
+                           row.get('state'),
+                           row.get('zip'), self.parse_deadline(row.get('deadline')), row.get('weight'),
+                           row.get('notes'),
+                           self.current_time)
+                   for row, location in zip(chunk, locations)]
+
+    def load(self, file_path, package_table):
+        """
+        reads file_path into package_table chunk by chunk
+        :param file_path: path to the package file
+        :param package_table: table to bulk insert into
+        :return: generator of the lists of packages inserted, the file is only read as far as the generator is advanced
+        """
+        with open(file_path) as package_file:
+            for packages in self.build_packages(self.read_chunks(package_file)):
+                package_table.bulk_insert(packages)
+                yield packages
+
+    def load_all(self, file_path, package_table):
+        """
+        reads the whole of file_path into package_table
+        :return: number of packages loaded
+        """
+        return sum(len(packages) for packages in self.load(file_path, package_table))
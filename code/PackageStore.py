@@ -0,0 +1,321 @@
+from datetime import date
+from datetime import datetime
+from datetime import time
+import numpy as np
+from Package import PackageStatus
+
+
+class PackageStore:
+    """
+    Columnar (struct of arrays) storage for large numbers of packages
+
+    Each package field is a column and a package is a row index into every column:
+        ids             int64
+        location        int32 index into locations
+        status          int8 PackageStatus value
+        deadline, status_time, hub_time, transit_time, delivery_time
+                        datetime64[s], NaT for None
+        city, state, zip, weight, notes, truck
+                        int32 index into a pool of distinct strings, -1 for None
+    Locations and strings are stored once no matter how many packages share them, a row takes about 80 bytes instead
+    of the 1 to 2 KB of a Package object with its dict, datetimes and strings.
+
+    Rows are read and written through PackageRecord views, which have the same attributes and methods as Package.
+    Columns grow by doubling, so appending is amortised O(1). Status and deadline filters run as NumPy comparisons over
+    whole columns.
+
+    Times given as a time of day are stored on 1900-01-01, the date datetime.strptime gives them.
+    """
+
+    TIME_COLUMNS = ('deadline', 'status_time', 'hub_time', 'transit_time', 'delivery_time')
+    STRING_COLUMNS = ('city', 'state', 'zip', 'weight', 'notes', 'truck')
+
+    def __init__(self, capacity=1024):
+        """
+        :param capacity: number of rows to allocate up front
+        """
+        self.size = 0
+        self.locations = []
+        self.location_index = {}
+        self.strings = []
+        self.string_index = {}
+        # column name -> (dtype, value unused rows hold)
+        self.layout = {'ids': (np.int64, 0), 'location': (np.int32, 0), 'status': (np.int8, 0)}
+        self.layout.update({name: ('datetime64[s]', np.datetime64('NaT')) for name in self.TIME_COLUMNS})
+        self.layout.update({name: (np.int32, -1) for name in self.STRING_COLUMNS})
+        self.columns = {name: np.full(capacity, fill, dtype=dtype) for name, (dtype, fill) in self.layout.items()}
+        # row -> listeners, only packages that have listeners get an entry
+        self.listeners = {}
+        # row numbers ordered by id and the ids in that order, rebuilt on the first lookup after rows are appended
+        self.id_order = None
+        self.sorted_ids = None
+
+    @classmethod
+    def from_packages(cls, packages):
+        """
+        copies Package objects into a new store
+        :param packages: iterable of Package
+        :return: PackageStore
+        """
+        packages = list(packages)
+        store = cls(max(len(packages), 1))
+        for package in packages:
+            store.add(package)
+        return store
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for row in range(self.size):
+            yield PackageRecord(self, row)
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.size:
+            raise IndexError(str('row %s out of range' % row))
+        return PackageRecord(self, row)
+
+    def column(self, name):
+        """
+        :return: read only view of the filled part of a column
+        """
+        view = self.columns[name][:self.size]
+        view.flags.writeable = False
+        return view
+
+    def grow(self, capacity):
+        """
+        reallocates every column with room for capacity rows
+        """
+        for name, (dtype, fill) in self.layout.items():
+            grown = np.full(capacity, fill, dtype=dtype)
+            grown[:self.size] = self.columns[name][:self.size]
+            self.columns[name] = grown
+
+    def location_code(self, location):
+        code = self.location_index.get(location)
+        if code is None:
+            code = len(self.locations)
+            self.locations.append(location)
+            self.location_index[location] = code
+        return code
+
+    def string_code(self, value):
+        if value is None:
+            return -1
+        code = self.string_index.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(value)
+            self.string_index[value] = code
+        return code
+
+    @staticmethod
+    def to_datetime64(value):
+        if value is None:
+            return np.datetime64('NaT')
+        if isinstance(value, time):
+            value = datetime.combine(date(1900, 1, 1), value)
+        return np.datetime64(value, 's')
+
+    def append(self, id, location, city, state, zip, deadline, weight, notes, current_time=time(0)):
+        """
+        adds a package at the hub, takes the same arguments as Package
+        :return: PackageRecord of the new row
+        """
+        if self.size == len(self.columns['ids']):
+            self.grow(max(len(self.columns['ids']) * 2, 1))
+        row = self.size
+        self.size += 1
+        self.id_order = None
+        columns = self.columns
+        columns['ids'][row] = id
+        columns['location'][row] = self.location_code(location)
+        columns['status'][row] = PackageStatus.AT_HUB.value
+        columns['deadline'][row] = self.to_datetime64(deadline)
+        columns['status_time'][row] = columns['hub_time'][row] = self.to_datetime64(current_time)
+        columns['transit_time'][row] = columns['delivery_time'][row] = np.datetime64('NaT')
+        for name, value in (('city', city), ('state', state), ('zip', zip), ('weight', weight), ('notes', notes),
+                            ('truck', None)):
+            columns[name][row] = self.string_code(value)
+        return PackageRecord(self, row)
+
+    def add(self, package):
+        """
+        copies a Package, including its status and times, into a new row
+        :return: PackageRecord of the new row
+        """
+        record = self.append(package.id, package.location, package.city, package.state, package.zip, package.deadline,
+                             package.weight, package.notes, package.hub_time)
+        row = record.row
+        self.columns['status'][row] = package.status.value
+        for name in ('status_time', 'transit_time', 'delivery_time'):
+            self.columns[name][row] = self.to_datetime64(getattr(package, name))
+        self.columns['truck'][row] = self.string_code(package.truck)
+        return record
+
+    def get(self, id):
+        """
+        :return: PackageRecord of the package with id, or None
+        """
+        if self.id_order is None:
+            ids = self.columns['ids'][:self.size]
+            self.id_order = np.argsort(ids, kind='stable')
+            self.sorted_ids = ids[self.id_order]
+        i = np.searchsorted(self.sorted_ids, id)
+        if i < self.size and self.sorted_ids[i] == id:
+            return PackageRecord(self, int(self.id_order[i]))
+        return None
+
+    def mask(self, status=None, deadline_before=None, locations=None):
+        """
+        vectorised filter over every row, conditions left as None are not applied
+        :param status: a PackageStatus
+        :param deadline_before: a time of day, matches packages due strictly before it
+        :param locations: an iterable of locations, matches packages delivered to any of them
+        :return: boolean NumPy array with one entry per row
+        """
+        mask = np.ones(self.size, dtype=bool)
+        if status is not None:
+            mask &= self.columns['status'][:self.size] == status.value
+        if deadline_before is not None:
+            deadlines = self.columns['deadline'][:self.size]
+            seconds = (deadlines - deadlines.astype('datetime64[D]')).astype(np.int64)
+            limit = deadline_before.hour * 3600 + deadline_before.minute * 60 + deadline_before.second
+            mask &= ~np.isnat(deadlines) & (seconds < limit)
+        if locations is not None:
+            codes = [self.location_index[location] for location in set(locations) if location in self.location_index]
+            mask &= np.isin(self.columns['location'][:self.size], codes)
+        return mask
+
+    def filter(self, status=None, deadline_before=None, locations=None):
+        """
+        :return: list of PackageRecord matching every condition, see mask()
+        """
+        return [PackageRecord(self, int(row)) for row in np.flatnonzero(self.mask(status, deadline_before, locations))]
+
+    def count(self, status=None, deadline_before=None, locations=None):
+        """
+        :return: number of packages matching every condition, see mask()
+        """
+        return int(np.count_nonzero(self.mask(status, deadline_before, locations)))
+
+    def nbytes(self):
+        """
+        :return: bytes held by the columns, not counting the shared location and string pools
+        """
+        return sum(column.nbytes for column in self.columns.values())
+
+
+def time_property(name):
+    def getter(self):
+        value = self.store.columns[name][self.row]
+        return None if np.isnat(value) else value.item()
+
+    def setter(self, value):
+        self.store.columns[name][self.row] = self.store.to_datetime64(value)
+    return property(getter, setter)
+
+
+def string_property(name):
+    def getter(self):
+        code = self.store.columns[name][self.row]
+        return None if code < 0 else self.store.strings[code]
+
+    def setter(self, value):
+        self.store.columns[name][self.row] = self.store.string_code(value)
+    return property(getter, setter)
+
+
+class PackageRecord:
+    """
+    A view of one row of a PackageStore with the attributes and methods of Package
+
+    Views hold no package data, they are created on access and compare equal when they refer to the same row.
+    """
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def id(self):
+        return int(self.store.columns['ids'][self.row])
+
+    @property
+    def location(self):
+        return self.store.locations[self.store.columns['location'][self.row]]
+
+    @location.setter
+    def location(self, location):
+        self.store.columns['location'][self.row] = self.store.location_code(location)
+
+    @property
+    def status(self):
+        return PackageStatus(int(self.store.columns['status'][self.row]))
+
+    @status.setter
+    def status(self, status):
+        self.store.columns['status'][self.row] = status.value
+
+    @property
+    def listeners(self):
+        return self.store.listeners.get(self.row, [])
+
+    deadline = time_property('deadline')
+    status_time = time_property('status_time')
+    hub_time = time_property('hub_time')
+    transit_time = time_property('transit_time')
+    delivery_time = time_property('delivery_time')
+    city = string_property('city')
+    state = string_property('state')
+    zip = string_property('zip')
+    weight = string_property('weight')
+    notes = string_property('notes')
+    truck = string_property('truck')
+
+    def __eq__(self, other):
+        return isinstance(other, PackageRecord) and self.store is other.store and self.row == other.row
+
+    def __hash__(self):
+        return hash((id(self.store), self.row))
+
+    def __str__(self):
+        return str("Package ID: %s\tDestination Address: %s\tSpecial Notes: %s" % (
+            self.id, self.location.address, self.notes))
+
+    def set_truck(self, truck):
+        self.truck = truck
+
+    def add_listener(self, listener):
+        listeners = self.store.listeners.setdefault(self.row, [])
+        if listener not in listeners:
+            listeners.append(listener)
+
+    def remove_listener(self, listener):
+        listeners = self.store.listeners.get(self.row)
+        if listeners and listener in listeners:
+            listeners.remove(listener)
+            if not listeners:
+                del self.store.listeners[self.row]
+
+    def set_status(self, status, time):
+        old_status = self.status
+        self.status = status
+        self.status_time = time
+        for listener in list(self.listeners):
+            listener.package_status_changed(self, old_status)
+
+    def set_delivered(self, time):
+        self.delivery_time = time
+        self.set_status(PackageStatus.DELIVERED, time)
+
+    def set_in_transit(self, time):
+        self.transit_time = time
+        self.set_status(PackageStatus.IN_TRANSIT, time)
+
+    def set_at_hub(self, time):
+        self.hub_time = time
+        self.set_status(PackageStatus.AT_HUB, time)
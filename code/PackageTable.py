@@ -0,0 +1,135 @@
+from bisect import bisect_left, insort
+from HashTable import HashTable
+from Package import PackageStatus
+
+
+class PackageTable(HashTable):
+    """
+    HashTable of packages keyed by package id with secondary indexes maintained alongside it
+
+        by_status    PackageStatus -> set of package ids
+        by_deadline  deadline time of day -> set of package ids, with the distinct deadlines kept sorted in deadlines
+        by_location  Location -> set of package ids
+
+    The table registers itself as a listener on every package it stores, so set_at_hub, set_in_transit and
+    set_delivered move the package between status sets as they happen. query() answers combined filters by starting
+    from the smallest matching index and checking the remaining conditions on those packages only, instead of scanning
+    every bucket.
+
+    Packages share a handful of deadlines, so indexing a package is O(1) unless it brings a deadline the table has not
+    seen yet, and loading a large manifest stays linear in its size.
+    """
+
+    def __init__(self, capacity=20, c1=0, c2=0):
+        super().__init__(capacity, c1, c2)
+        self.by_status = {status: set() for status in PackageStatus}
+        self.by_deadline = {}
+        self.deadlines = []
+        self.by_location = {}
+
+    def add_to_indexes(self, package):
+        self.by_status[package.status].add(package.id)
+        deadline = package.deadline.time()
+        deadline_ids = self.by_deadline.get(deadline)
+        if deadline_ids is None:
+            deadline_ids = self.by_deadline[deadline] = set()
+            insort(self.deadlines, deadline)
+        deadline_ids.add(package.id)
+        self.by_location.setdefault(package.location, set()).add(package.id)
+        package.add_listener(self)
+
+    def remove_from_indexes(self, package):
+        package.remove_listener(self)
+        self.by_status[package.status].discard(package.id)
+        deadline = package.deadline.time()
+        deadline_ids = self.by_deadline.get(deadline)
+        if deadline_ids is not None:
+            deadline_ids.discard(package.id)
+            if not deadline_ids:
+                del self.by_deadline[deadline]
+                del self.deadlines[bisect_left(self.deadlines, deadline)]
+        location_ids = self.by_location.get(package.location)
+        if location_ids is not None:
+            location_ids.discard(package.id)
+            if not location_ids:
+                del self.by_location[package.location]
+
+    def relocate(self, package, location):
+        """
+        changes the delivery location of a stored package, keeping the location index up to date
+        :param package: package stored in the table
+        :param location: new delivery location
+        :return: None
+        """
+        self.remove_from_indexes(package)
+        package.location = location
+        self.add_to_indexes(package)
+
+    def package_status_changed(self, package, old_status):
+        """
+        called by a stored package whenever its status changes
+        """
+        self.by_status[old_status].discard(package.id)
+        self.by_status[package.status].add(package.id)
+
+    def insert(self, item):
+        existing = self.search(item.id)
+        if existing is not None:
+            self.remove_from_indexes(existing)
+        stored = super().insert(item)
+        if stored:
+            self.add_to_indexes(item)
+        return stored
+
+    def bulk_insert(self, items):
+        items = list(items)
+        for item in items:
+            existing = self.search(item.id)
+            if existing is not None:
+                self.remove_from_indexes(existing)
+        inserted = super().bulk_insert(items)
+        for item in items:
+            # a batch may hold the same id twice, only the stored one is indexed
+            if self.search(item.id) == item:
+                self.add_to_indexes(item)
+        return inserted
+
+    def remove(self, item_id):
+        item = super().remove(item_id)
+        if item is not None:
+            self.remove_from_indexes(item)
+        return item
+
+    def deadline_ids(self, deadline_before):
+        """
+        :param deadline_before: time of day
+        :return: ids of packages due strictly before deadline_before, earliest deadline first, by id within a deadline
+        """
+        end = bisect_left(self.deadlines, deadline_before)
+        return [package_id for deadline in self.deadlines[:end] for package_id in sorted(self.by_deadline[deadline])]
+
+    def query(self, status=None, deadline_before=None, locations=None):
+        """
+        finds packages matching every condition given, conditions left as None are not applied
+        e.g. query(PackageStatus.AT_HUB, time(10, 30), route) for packages at the hub, due before 10:30 and delivered
+        somewhere on route
+        :param status: a PackageStatus
+        :param deadline_before: a time of day, matches packages due strictly before it
+        :param locations: an iterable of locations, matches packages delivered to any of them
+        :return: list of matching packages ordered by id
+        """
+        candidates = []
+        if status is not None:
+            candidates.append(self.by_status[status])
+        if locations is not None:
+            location_ids = set()
+            for location in set(locations):
+                location_ids.update(self.by_location.get(location, ()))
+            candidates.append(location_ids)
+        if deadline_before is not None:
+            candidates.append(set(self.deadline_ids(deadline_before)))
+        if not candidates:
+            return sorted(self.get_all_packages(), key=lambda p: p.id)
+        candidates.sort(key=len)
+        ids = set(candidates[0]).intersection(*candidates[1:])
+        return [self.search(package_id) for package_id in sorted(ids)]
@@ -1,48 +1,76 @@
+import heapq
+import time as clock
+from itertools import count
+from MetricsRegistry import TIMER_BUCKETS
+from MetricsRegistry import metrics
 
 
 class PathFinderAlgorithm:
-    def __init__(self, graph, start_location, **locations):
+    def __init__(self, graph, start_location, locations=None):
         """
-        Implements Dijkstra's shortest path algorithm
-        runs in 0(V^2) time where V vertices are locations
+        Implements Dijkstra's shortest path algorithm using a binary heap with lazy deletion
+        runs in O((V + E) log V) time where V vertices are locations and E edges are the distances between them
+        if locations are supplied the search stops as soon as every one of them has been settled, otherwise the full
+        shortest path tree from start_location is built. Either way a single run answers calculate_path for every
+        settled location.
         :param graph: a graph data structure storing the data to be processed
         :param start_location: starting location used to calculate the distance to
-        :param locations: a subset of the locations inside of the graph which are used to narrow the search
+        :param locations: an optional subset of the locations inside of the graph, the search terminates once all of
+        them have been settled
         """
+        started = clock.perf_counter() if metrics.enabled else None
         self.start_location = start_location
         self.graph = graph
+        self.settled = set()
+        # shortest known distance from start_location and previous location on that path, kept per run so several
+        # shortest path trees can be held at once
+        self.distances = {start_location: 0}
+        self.predecessors = {start_location: None}
 
-        found_not_visited = []
-        for location in self.graph.adjacency_list:
-            # checks if location is currently in package list
-            if locations and location in locations:
-                found_not_visited.append(location)
-            location.distance = float('inf')
-            location.predecessor = None
+        targets = set(locations) if locations else set()
+        targets.discard(start_location)
 
-        self.start_location.distance = 0
+        # heap entries are (distance, tie breaker, location), the tie breaker keeps locations from being compared
+        tie_breaker = count()
+        found_not_visited = [(0, next(tie_breaker), self.start_location)]
 
-        # while found_not_visited has a positive length
-        while len(found_not_visited):
-            shortest_distance_index = 0
-            # loops through to find the shortest index
-            for i in range(1, len(found_not_visited)):
-                if found_not_visited[i].distance < found_not_visited[shortest_distance_index].distance:
-                    shortest_distance_index = i
-            current_location = found_not_visited.pop(shortest_distance_index)
+        while found_not_visited:
+            current_distance, _, current_location = heapq.heappop(found_not_visited)
+            # stale entry left behind by a later, shorter distance (lazy deletion)
+            if current_location in self.settled:
+                continue
+            self.settled.add(current_location)
+            if targets:
+                targets.discard(current_location)
+                if not targets:
+                    break
 
             # checks potential next stops for shortest distance
             for possible_stop in self.graph.adjacency_list[current_location]:
-                distance_to_possible_stop = self.graph.edge_weights[(current_location, possible_stop)]
-                total_distance_from_start = current_location.distance + distance_to_possible_stop
+                if possible_stop in self.settled:
+                    continue
+                total_distance_from_start = current_distance + self.graph.edge_weights[(current_location,
+                                                                                        possible_stop)]
 
                 # checks if current calculated distance from start to location is shorter than its current stored
-                # distance. if so, that known distance is updated to the current calculated distance.
+                # distance. if so, that known distance is updated and the location is pushed onto the heap again.
+                if total_distance_from_start < self.distances.get(possible_stop, float('inf')):
+                    self.distances[possible_stop] = total_distance_from_start
+                    self.predecessors[possible_stop] = current_location
+                    heapq.heappush(found_not_visited,
+                                   (total_distance_from_start, next(tie_breaker), possible_stop))
 
-                if total_distance_from_start < possible_stop.distance:
-                    possible_stop.distance = total_distance_from_start
-                    possible_stop.predecessor = current_location
-                    possible_stop.sequence_to_start.append(current_location)
+        if started is not None:
+            metrics.increment('pathfinder_runs_total')
+            metrics.observe('pathfinder_settled_locations', len(self.settled))
+            metrics.observe('pathfinder_seconds', clock.perf_counter() - started, TIMER_BUCKETS)
+
+    def get_shortest_path_tree(self):
+        """
+        returns the shortest path tree built by the constructor
+        :return: a dict of each settled location to its predecessor, start_location maps to None
+        """
+        return {location: self.predecessors[location] for location in self.settled}
 
     def calculate_path(self, end_location):
         """
@@ -59,7 +87,7 @@ class PathFinderAlgorithm:
         # traverse path in opposite order by adding locations predecessors
         while current_location and current_location != self.start_location:
             calculated_path.append(current_location)
-            current_location = current_location.predecessor
+            current_location = self.predecessors.get(current_location)
         # reverse calculated_path to reflect actual order of traversed path
         calculated_path.reverse()
         # insert original path
@@ -0,0 +1,839 @@
+import copy
+import csv
+import random
+import time as clock
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+from AddressResolver import AddressResolver
+from AnytimeOptimizer import AnytimeOptimizer
+from DeliveryLog import DeliveryLog
+from DestinationGraph import DestinationGraph
+from DestinationGraph import Location
+from FleetSimulator import FleetSimulator
+from FleetSolver import FleetSolver
+from MetricsRegistry import TIMER_BUCKETS
+from MetricsRegistry import metrics
+from Package import PackageStatus
+from PackageLoader import PackageLoader
+from PackageTable import PackageTable
+from PathFinderAlgorithm import PathFinderAlgorithm
+from RouteImprover import RouteImprover
+from RouteRepair import RouteRepair
+from RouteTiming import RouteTiming
+from TimeKeeper import TimeKeeper
+try:
+    from GraphCache import GraphCache
+    from HeldKarpSolver import HeldKarpSolver
+    from RoutePlan import RoutePlan
+    from RouteScorer import RouteScorer
+except ImportError:
+    # NumPy is not installed, the distance table is parsed on every start, the exact solver falls back to restarts,
+    # routes are scored one at a time and trucks are driven stop by stop
+    GraphCache = None
+    HeldKarpSolver = None
+    RoutePlan = None
+    RouteScorer = None
+
+
+# planners of pool worker processes keyed by Planner.config(), inherited from the parent on fork or built on spawn
+worker_planners = {}
+
+
+def get_random_from_list(list_to_select_from, rng=random):
+    """
+    selects a random item from a list
+    :param list_to_select_from: a list or iterable type which a random candidate is chosen
+    :param rng: random number generator to draw from, defaults to the random module
+    :return: the item selected
+    """
+    return list_to_select_from[rng.randint(0, len(list_to_select_from) - 1)]
+
+
+def sample_solutions_worker(config, candidate_addresses, start_address, path_length, calculations, seed,
+                            timing_args=None):
+    """
+    process pool entry point for Planner.sample_solutions
+    locations are passed by address and resolved against the worker's planner for config, which only loads its graph
+    timing_args is None or a tuple of start time, a dict of address to window and speed to rebuild a RouteTiming from
+    :return: a tuple of the shortest distance and the addresses of the shortest sequence found
+    """
+    planner = worker_planners.get(config)
+    if planner is None:
+        planner = Planner(*config)
+        worker_planners[config] = planner
+    all_locations = planner.all_locations
+    timing = None
+    if timing_args:
+        start_time, windows, speed = timing_args
+        timing = RouteTiming(planner.destination_graph, all_locations[start_address], start_time,
+                             {all_locations[address]: window for address, window in windows.items()}, speed)
+    distance, sequence = planner.sample_solutions(set(map(all_locations.get, candidate_addresses)),
+                                                  all_locations[start_address], path_length, calculations,
+                                                  random.Random(seed), timing)
+    return distance, [location.address for location in sequence]
+
+
+class Planner:
+    """
+    Holds one dataset, a distance table and a package file, and plans deliveries for it
+
+    Creating a planner does not read anything. The distance table is loaded the first time the graph, its locations or
+    the address resolver are used, and the package file the first time package_table is, so a planner only pays for
+    the data it needs and several planners with different files can live side by side.
+    The time each loading phase took is recorded in timings, see startup_report().
+    Package status changes are recorded in delivery_log as trucks are dispatched.
+    """
+
+    def __init__(self, distance_table_path='./assets/distance_table.csv', package_file_path='./assets/package_file.csv',
+                 cache_dir='./assets/.graph_cache', hub_address='4001 South 700 East', solution_cache=None):
+        """
+        :param distance_table_path: path to the distance table csv
+        :param package_file_path: path to the package csv
+        :param cache_dir: directory compiled graphs are cached in, None disables the cache
+        :param hub_address: address of the hub in the distance table
+        :param solution_cache: optional SolutionCache determine_solution looks routes up in, it is not part of config()
+        """
+        self.distance_table_path = distance_table_path
+        self.package_file_path = package_file_path
+        self.cache_dir = cache_dir
+        self.hub_address = hub_address
+        self.solution_cache = solution_cache
+        self.special_packages_delivered_together = set()
+        self.special_packages_truck_2 = set()
+        self.special_packages_delayed = set()
+        self.special_packages_wrong_address = set()
+        # Timekeeper used for start of day
+        self.time_keeper = TimeKeeper()
+        # phase name -> seconds, in the order the phases ran
+        self.timings = {}
+        self._destination_graph = None
+        self._all_locations = None
+        self._address_resolver = None
+        self._package_table = None
+        self._delivery_log = None
+
+    @classmethod
+    def from_graph(cls, graph, hub_address, packages=()):
+        """
+        builds a planner around data that is already in memory instead of files, e.g. a generated city
+        :param graph: DestinationGraph to plan on
+        :param hub_address: address of the hub location in graph
+        :param packages: packages to fill package_table with
+        :return: Planner
+        """
+        planner = cls(distance_table_path=None, package_file_path=None, cache_dir=None, hub_address=hub_address)
+        planner._destination_graph = graph
+        planner._all_locations = {location.address: location for location in graph.get_locations()}
+        planner._address_resolver = planner.timed('address_index', AddressResolver, graph.get_locations())
+        package_table = PackageTable()
+        planner.timed('package_file', package_table.bulk_insert, packages)
+        planner._delivery_log = DeliveryLog.from_packages(package_table.get_all_packages())
+        planner._package_table = package_table
+        return planner
+
+    def config(self):
+        """
+        :return: the constructor arguments, enough to build an equivalent planner in another process
+        """
+        return self.distance_table_path, self.package_file_path, self.cache_dir, self.hub_address
+
+    def timed(self, phase, function, *args):
+        started = clock.perf_counter()
+        result = function(*args)
+        self.timings[phase] = self.timings.get(phase, 0) + clock.perf_counter() - started
+        return result
+
+    def startup_report(self):
+        """
+        :return: a human readable line per loading phase with the time it took
+        """
+        return '\n'.join('%-16s %8.1f ms' % (phase, seconds * 1000) for phase, seconds in self.timings.items())
+
+    def load_graph(self):
+        """
+        loads the distance table, from the graph cache when possible, and indexes its locations by address
+        :return: None
+        """
+        if GraphCache and self.cache_dir is not None:
+            graph = self.timed('distance_table', GraphCache(self.cache_dir).load_graph, self.distance_table_path,
+                               self.parse_distance_table)
+        else:
+            graph = self.timed('distance_table', self.parse_distance_table, self.distance_table_path)
+        # a cached graph holds its own location objects, all_locations and address_resolver are built to point at them
+        self._all_locations = {location.address: location for location in graph.get_locations()}
+        self._address_resolver = self.timed('address_index', AddressResolver, graph.get_locations())
+        self._destination_graph = graph
+
+    @property
+    def destination_graph(self):
+        if self._destination_graph is None:
+            self.load_graph()
+        return self._destination_graph
+
+    @property
+    def all_locations(self):
+        if self._destination_graph is None:
+            self.load_graph()
+        return self._all_locations
+
+    @property
+    def address_resolver(self):
+        if self._destination_graph is None:
+            self.load_graph()
+        return self._address_resolver
+
+    @property
+    def package_table(self):
+        if self._package_table is None:
+            package_table = PackageTable()
+            loader = PackageLoader(self.address_resolver, self.time_keeper.current_time)
+            self.timed('package_file', loader.load_all, self.package_file_path, package_table)
+            self._delivery_log = DeliveryLog.from_packages(package_table.get_all_packages())
+            self._package_table = package_table
+        return self._package_table
+
+    @property
+    def delivery_log(self):
+        """
+        DeliveryLog of every package in package_table, recording status changes from the moment the packages are loaded
+        """
+        if self._package_table is None:
+            self.package_table
+        return self._delivery_log
+
+    def search_location(self, search_term):
+        """
+        searches the known locations for an address, returns the location if the address is similar enough
+        exact matches are returned directly, otherwise address_resolver matches a normalized form of the address
+        against the locations sharing its house number, which allows typos and differently written addresses to be
+        corrected.
+        :param search_term: address to be searched
+        :return: found location object
+        """
+        return self.address_resolver.resolve(search_term)
+
+    def parse_distance_table(self, file_path):
+        """
+        Parses location information from distance_table.csv
+        column headers are matched to the parsed locations with an AddressResolver of their own
+        :param file_path: path to the distance table csv
+        :return: a DestinationGraph of the parsed locations and distances
+        """
+        graph = DestinationGraph()
+        address_resolver = AddressResolver()
+        with open(file_path, newline='') as distance_file:
+            distance_table = csv.DictReader(distance_file, delimiter=',', skipinitialspace=True, lineterminator='\n',
+                                            dialect='excel')
+            formatted_locations = []
+            # stores locations added. uses additional memory but reduces future iterations to find graph object
+
+            for location in distance_table:
+                # stores formatted locations so they can be used in the future
+                formatted_location = {}
+                # iterate through the location item, format values and adds them to formatted_location
+                for key, value in location.items():
+                    if key == 'name':
+                        formatted_location['name'] = location.get('name').split('\n')[0].strip()
+                    elif key == 'address':
+                        split_location = location.get('address').split('\n')
+                        formatted_location['address'] = split_location[0].strip()
+                        if len(split_location) > 1:
+                            formatted_location['address_zip'] = split_location[1].strip('(').strip(')')
+                    else:
+                        key = key.split('\n')[1].strip().strip(',')
+                        formatted_location[key] = value.strip()
+                    if value == 'HUB':
+                        formatted_location[key] = self.hub_address
+                    if key == 'HUB':
+                        formatted_location[self.hub_address] = value
+                # adds location to graph, this allows a second iteration to loop through and add edges after
+                # locations are created
+                new_location = Location(formatted_location.get('address', None),
+                                        formatted_location.get('address_zip', None),
+                                        formatted_location.get('name', None))
+
+                address_resolver.add_location(new_location)
+                graph.add_location(new_location)
+                formatted_locations.append(formatted_location)
+
+            for formatted_location in formatted_locations:
+                for key, value in formatted_location.items():
+                    if key == 'address' or key == 'address_zip' or key == 'name':
+                        continue
+                    if value != '':
+                        destination = address_resolver.resolve(key)
+                        found_location = address_resolver.resolve(formatted_location.get('address'))
+                        graph.add_edge(found_location, destination, float(value))
+        return graph
+
+    def sample_solutions(self, location_candidates, start_location, path_length, calculations, rng=random,
+                         timing=None):
+        """
+        runs calculations iterations of the brute force search described in find_solution
+        candidates are drawn in address order so a seeded rng always produces the same sequences. Every sequence is
+        generated first and then scored in one batch by score_routes.
+        With a timing, arrival times are tracked while a sequence is built and the sequence is abandoned as soon as a
+        stop is reached after its window closes. If every sequence is abandoned the search is repeated without timing.
+        :param location_candidates: a set of locations to act as potential candidates for stops on a delivery route
+        :param start_location: the starting location
+        :param path_length: the number of stops for the algorithm to consider
+        :param calculations: number of iterations to run
+        :param rng: random number generator to draw candidates with
+        :param timing: optional RouteTiming the sequences have to keep to
+        :return: a tuple of the shortest distance and the shortest sequence found
+        """
+        sequences = []
+        shortest_path_trees = {}
+        # sorted once, every restart draws from the part of it that is still a candidate
+        ordered_candidates = sorted(location_candidates, key=lambda x: x.address)
+        for i in range(calculations):
+            current_location = start_location
+            destination_sequence = []
+            candidates = copy.copy(location_candidates)
+            remaining = ordered_candidates
+            current_time = timing.start_time if timing else None
+            visited = set()
+            on_time = True
+            i = 0
+            # emulates a do while loop
+            while True:
+                if not candidates or not len(location_candidates) - len(candidates) <= path_length:
+                    break
+                random_candidate = get_random_from_list(remaining, rng)
+                algo = shortest_path_trees.get(current_location)
+                if algo is None:
+                    algo = PathFinderAlgorithm(self.destination_graph, current_location, locations=location_candidates)
+                    shortest_path_trees[current_location] = algo
+                result = algo.calculate_path(random_candidate)[0]
+                if timing:
+                    for previous_location, location in zip(result, result[1:]):
+                        current_time += timedelta(minutes=timing.leg_minutes(previous_location, location))
+                        current_time, minutes_late = timing.arrive(current_time, location)
+                        if minutes_late > 0 and location not in visited:
+                            on_time = False
+                            break
+                        visited.add(location)
+                    if not on_time:
+                        break
+                # [1:] removes the first, which is duplicate of end location in last iteration
+                destination_sequence.extend(result[1:])
+                candidates.difference_update(set(result))
+                remaining = [location for location in remaining if location in candidates]
+                current_location = result[len(result) - 1]
+                i += 1
+            if on_time:
+                sequences.append(destination_sequence)
+        if metrics.enabled:
+            metrics.increment('solver_restarts_total', calculations)
+            metrics.increment('solver_abandoned_restarts_total', calculations - len(sequences))
+        if not sequences:
+            if timing:
+                return self.sample_solutions(location_candidates, start_location, path_length, calculations, rng)
+            return float('inf'), []
+        distances = self.score_routes(sequences, start_location)
+        # the first of equal distances is kept
+        shortest = min(range(len(sequences)), key=distances.__getitem__)
+        if metrics.enabled:
+            self.record_restart_curve(distances, shortest)
+        return distances[shortest], sequences[shortest]
+
+    @staticmethod
+    def record_restart_curve(distances, shortest):
+        """
+        records how the best distance developed over the restarts of one sample_solutions call
+        :param distances: the distance of every kept restart, in the order they were sampled
+        :param shortest: index of the returned restart
+        :return: None
+        """
+        best = float('inf')
+        improvements = 0
+        for distance in distances:
+            if distance < best:
+                best = distance
+                improvements += 1
+        metrics.increment('solver_improvements_total', improvements)
+        metrics.observe('solver_best_restart', shortest + 1)
+
+    def score_routes(self, routes, start_location):
+        """
+        calculates the total distance of every route, with RouteScorer in one batch when NumPy is available
+        :param routes: a list of routes, each a sequence of locations visited after start_location
+        :param start_location: the location every route leaves from
+        :return: a list of total distances in the same order as routes
+        """
+        graph = self.destination_graph
+        if RouteScorer:
+            return RouteScorer(graph.get_distance_matrix()).score_locations(routes, start_location).tolist()
+        distances = []
+        for route in routes:
+            stops = [start_location] + list(route)
+            distances.append(sum(graph.get_distance(stops[i], stops[i + 1]) for i in range(len(stops) - 1)))
+        return distances
+
+    def find_solution(self, location_candidates, start_location, path_length=12, calculations=1000, workers=1,
+                      seed=None, timing=None):
+        """
+        Uses a brute force approach with the PathFinderAlgorithm to determine an optimal delivery route given the
+        parameters
+        The internal while loop runs until it generates a solution sequence of path_length by running the
+        PathFinderAlgorithm against a randomly selected destination location. It stitches multiple PathFinderAlgorithm
+        results until it satisfies the path_length requirement. The total distance along the path is calculated, and if
+        the distance is shorter than the previous shortest distance, it is stored. The outer algorithm is run a large
+        number of times to find a viable solution.
+
+        While the outer loop is not quick, it runs a fixed amount of times and is O(1). The inner loop is O(T)
+        (for truck size or truck count). The PathFinderAlgorithm uses a heap based Dijkstra's shortest path which runs
+        in O(E log V) and stops once every candidate is settled. Its shortest path tree only depends on the start
+        location, so each tree is built once per call and reused by every iteration, at most V times overall.
+        Locations passed through on the way to a candidate are part of the sequence but do not count towards
+        path_length.
+
+        With more than one worker the calculations are split across a process pool. Each worker draws from its own
+        generator seeded from seed and its worker number, and the shortest result wins with ties going to the lowest
+        worker number, so a given seed and worker count always produce the same route.
+
+        :param location_candidates: a set of locations to act as potential candidates for stops on a delivery route
+        :param start_location: the starting location
+        :param path_length: the path length or number of stops for the algorithm to consider defaults to 12
+        :param calculations: number of iterations for the brute force algorithm to run defaults to 1000
+        :param workers: number of processes to split calculations across defaults to 1, which runs in this process
+        :param seed: optional seed for reproducible results, defaults to drawing from the random module
+        :param timing: optional RouteTiming, sequences reaching a stop after its window closes are abandoned
+        :return: the shortest sequence found in the calculations
+        """
+        with metrics.timer('solver_seconds'):
+            return self.sample_in_pool(location_candidates, start_location, path_length, calculations, workers, seed,
+                                       timing)
+
+    def sample_in_pool(self, location_candidates, start_location, path_length, calculations, workers, seed, timing):
+        """
+        runs find_solution's calculations in this process, or split across a pool of worker processes
+        :return: the shortest sequence found
+        """
+        if workers <= 1:
+            rng = random if seed is None else random.Random(seed)
+            return self.sample_solutions(location_candidates, start_location, path_length, calculations, rng, timing)[1]
+
+        if seed is None:
+            seed = random.getrandbits(64)
+        candidate_addresses = [location.address for location in location_candidates]
+        timing_args = None
+        if timing:
+            timing_args = (timing.start_time,
+                           {location.address: window for location, window in timing.windows.items()}, timing.speed)
+        # forked workers inherit this planner with its graph already loaded
+        worker_planners[self.config()] = self
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(sample_solutions_worker, self.config(), candidate_addresses,
+                                   start_location.address, path_length,
+                                   calculations // workers + (1 if worker < calculations % workers else 0),
+                                   '%s-%s' % (seed, worker), timing_args)
+                       for worker in range(workers)]
+            results = [future.result() for future in futures]
+        # min keeps the first of equal distances, which is the lowest worker number
+        shortest_distance, shortest_addresses = min(results, key=lambda result: result[0])
+        return [self.all_locations[address] for address in shortest_addresses]
+
+    def match_packages_to_locations(self, locations, packages, qty: int, predicate=None):
+        """
+        finds packages that are to be delivered to the locations supplied
+        :param locations: a list of locations to match packages to
+        :param packages: a list of packages to choose from
+        :param qty: the quantity of packages to return
+        :param predicate: an optional predicate to alter the scope of the filter function
+        :return: a list made up of packages who's delivery destinations match the supplied locations
+        """
+        # the location index narrows the table down to packages for these locations, packages then limits the choice
+        packages = set(packages)
+        matches = [p for p in self.package_table.query(locations=locations) if p in packages]
+        if predicate:
+            return list(filter(lambda p: predicate, matches))[:qty - 1]
+        else:
+            return matches[:qty - 1]
+
+    def determine_solution(self, package_list, start_location, path_length=16, calculations=1000, package_length=16,
+                           workers=1, seed=None, solver='restarts', improve=False, max_exact_stops=16, time_budget=0.2,
+                           on_improvement=None, start_time=None):
+        """
+        a parent function to the match_packages_to_locations and find_solution functions.
+        maps a list of packages to a list of locations.
+        if the find_solution function delivers a solution with more packages than the desired package_length, the
+        destinations are looped through adding their respective packages until the package limit has been met. All
+        remaining destinations are discarded.
+        when a start_time is given, the deadlines of package_list are handed to the solver as a RouteTiming so it looks
+        for a route that delivers every package on time.
+        with a solution_cache, routes are looked up by graph, start location, stops and every setting that changes the
+        route, and only solved on a miss. Runs reporting to on_improvement always solve.
+        :param package_list: a list of packages to retrieve locations from
+        :param start_location: the start location
+        :param path_length: path length to be passed to find_solution
+        :param calculations: calculation count to be passed to find_solution
+        :param package_length: the total number of packages to be returned
+        :param workers: process count to be passed to find_solution
+        :param seed: seed to be passed to find_solution
+        :param solver: 'restarts' uses find_solution, 'local_search' builds a nearest neighbour route and improves it
+        with RouteImprover
+        'exact' returns the optimal route from HeldKarpSolver when there are at most max_exact_stops unique stops and
+        no more than find_solution would visit, otherwise it falls back to 'restarts' with the improve post pass
+        'anytime' builds the 'local_search' route and improves it with AnytimeOptimizer, both within time_budget
+        seconds
+        :param improve: run RouteImprover over the find_solution route as a post pass
+        :param max_exact_stops: largest unique stop count the 'exact' solver is used for
+        :param time_budget: wall clock seconds the 'anytime' solver may run for, including building its initial route
+        :param on_improvement: function the 'anytime' solver calls with (route, distance, elapsed) for every better
+        route
+        :param start_time: optional datetime the route starts at, enables deadline aware routing
+        :return: a tuple of the delivery route, the packages to load for it and, with a start_time, the lateness of the
+        delivery route as RouteTiming.lateness gives it (late stops, total minutes late, most minutes late at one
+        stop), None without
+        """
+        started = clock.perf_counter() if metrics.enabled else None
+        graph = self.destination_graph
+        location_candidates = set(map(lambda p: p.location, package_list))
+        timing = None
+        if start_time is not None:
+            timing = RouteTiming.from_packages(graph, start_location, start_time, package_list)
+        improver = RouteImprover(graph, start_location, timing=timing)
+        # find_solution stops once it has made more than path_length stops
+        stop_limit = path_length + 1
+        settings = None
+        delivery_solution = None
+        if self.solution_cache is not None and on_improvement is None:
+            settings = (solver, path_length, calculations, workers, seed, improve, max_exact_stops, time_budget,
+                        self.timing_settings(timing))
+            stop_addresses = [location.address for location in location_candidates]
+            cached_route = self.solution_cache.get(graph, start_location.address, stop_addresses, settings)
+            if cached_route is not None:
+                delivery_solution = [self.all_locations[address] for address in cached_route]
+        if delivery_solution is None:
+            if solver == 'exact':
+                exact_stops = len(location_candidates - {start_location})
+                if HeldKarpSolver and exact_stops <= min(max_exact_stops, stop_limit):
+                    delivery_solution = HeldKarpSolver(graph, start_location, max_stops=max_exact_stops,
+                                                       timing=timing).solve(location_candidates)[0]
+                else:
+                    delivery_solution = improver.improve(self.find_solution(location_candidates, start_location,
+                                                                            path_length, calculations, workers, seed,
+                                                                            timing))
+            elif solver == 'local_search':
+                delivery_solution = improver.solve(location_candidates, stop_limit)
+            elif solver == 'anytime':
+                construction_started = clock.perf_counter()
+                initial_route = improver.solve(location_candidates, stop_limit)
+                # building the initial route is part of the budget, the optimizer gets what is left of it
+                remaining_budget = max(0.0, time_budget - (clock.perf_counter() - construction_started))
+                delivery_solution = AnytimeOptimizer(graph, start_location, time_budget=remaining_budget,
+                                                     on_improvement=on_improvement, seed=seed,
+                                                     timing=timing).solve(location_candidates, initial_route)
+            elif solver == 'restarts':
+                delivery_solution = self.find_solution(location_candidates, start_location, path_length, calculations,
+                                                       workers, seed, timing)
+                if improve:
+                    delivery_solution = improver.improve(delivery_solution)
+            else:
+                raise ValueError(str('unknown solver %s' % solver))
+            if settings is not None:
+                self.solution_cache.put(graph, start_location.address, stop_addresses, settings,
+                                        [location.address for location in delivery_solution])
+        if started is not None:
+            metrics.increment('route_solves_total')
+            metrics.observe('route_stops', len(delivery_solution))
+            metrics.observe('route_solve_seconds', clock.perf_counter() - started, TIMER_BUCKETS)
+        matched_packages = self.match_packages_to_locations(delivery_solution, package_list, 15)
+        packages_to_load = []
+        delivery_route = []
+        if len(matched_packages) > package_length:
+            i = 0
+            while len(packages_to_load) <= package_length and i < len(delivery_solution) - 1:
+                packages_to_load.extend(self.match_packages_to_locations([delivery_solution[i]],
+                                                                         package_list,
+                                                                         package_length - len(packages_to_load)))
+                delivery_route.append(delivery_solution[i])
+                i += 1
+
+        else:
+            packages_to_load = matched_packages
+            delivery_route = delivery_solution
+        lateness = timing.lateness(delivery_route) if timing is not None else None
+        return delivery_route, packages_to_load, lateness
+
+    @staticmethod
+    def timing_settings(timing):
+        """
+        :param timing: RouteTiming or None
+        :return: the speed and windows of timing for SolutionCache keys, windows are given in minutes after the start
+        time so the same deadlines on another day or for a truck leaving at another time give the same key
+        """
+        if timing is None:
+            return None
+
+        def minutes_after_start(window_time):
+            return None if window_time is None else (window_time - timing.start_time).total_seconds() / 60
+        windows = sorted((location.address, minutes_after_start(earliest), minutes_after_start(latest))
+                         for location, (earliest, latest) in timing.windows.items())
+        return (timing.speed,) + tuple(windows)
+
+    def route_repair(self, start_location, start_time=None, packages=(), window=3):
+        """
+        :param start_location: location the route to repair leaves from, for a trip under way the stop the truck is
+        driving to
+        :param start_time: optional datetime the route leaves start_location, enables deadline checks for packages
+        :param packages: packages whose deadlines the repaired route has to keep to
+        :param window: stops on each side of a change that may be reordered
+        :return: RouteRepair for routes from start_location back to the hub
+        """
+        timing = None
+        if start_time is not None:
+            timing = RouteTiming.from_packages(self.destination_graph, start_location, start_time, packages)
+        return RouteRepair(self.destination_graph, start_location, self.search_location(self.hub_address), timing,
+                           window)
+
+    def correct_package_address(self, package, address, truck=None, route=None, simulator=None):
+        """
+        changes the delivery address of a package, and the route delivering it when there is one
+        with a simulator, the trip truck is driving is repaired from the stop it is heading to and rerouted. With a
+        route, the planned route leaving the hub is repaired and returned. Every check is made before package, truck or
+        package_table are changed, so a ValueError leaves them as they were.
+        :param package: package to correct
+        :param address: corrected address, resolved like search_location
+        :param truck: optional truck carrying package, its stop for package is moved
+        :param route: optional planned route delivering package
+        :param simulator: optional FleetSimulator truck is driving in
+        :return: RouteChange of the repaired route, None without a route or simulator
+        """
+        location = self.search_location(address)
+        if location is None:
+            raise ValueError(str('unknown address %s' % address))
+        if location is self.search_location(self.hub_address):
+            raise ValueError(str('package %s cannot be delivered to the hub' % package.id))
+        if simulator is not None:
+            if truck is None:
+                raise ValueError(str('package %s needs the truck carrying it to be rerouted' % package.id))
+            # raises for a truck that is not out on a trip, before anything has been changed
+            heading, arrival, stops = simulator.remaining_route(truck)
+        old_location = package.location
+        if truck is not None and package in truck.packages:
+            truck.move_package(package, location)
+        self.package_table.relocate(package, location)
+        # package now has its corrected location, so its deadline applies there when the route is checked
+        if simulator is not None:
+            change = self.route_repair(heading, arrival, truck.packages).relocate_package(
+                stops, package, location, truck.packages, old_location)
+            simulator.reroute(truck, change.route)
+            return change
+        if route is not None:
+            packages = truck.packages if truck is not None else self.package_table.query(PackageStatus.AT_HUB,
+                                                                                         locations=route)
+            return self.route_repair(self.search_location(self.hub_address)).relocate_package(
+                route, package, location, packages, old_location)
+        return None
+
+    def dispatch_truck(self, truck, delivery_route, packages):
+        """
+        dispatches a truck and makes deliveries upon a given route
+        loops through the trucks delivery_route until all of the packages have been delivered then returns truck to hub
+        straight from the last delivery, with NumPy the route is compiled into a RoutePlan first which does the same
+        :param truck: truck to use
+        :param delivery_route: a sequence of locations which act as the route for the truck to follow
+        :param packages: packages to be loaded onto the truck and delivered
+        :return: None
+        """
+        graph = self.destination_graph
+        hub_location = self.search_location(self.hub_address)
+        truck.load(packages)
+        if RoutePlan:
+            RoutePlan.compile(graph.get_distance_matrix(), truck.current_location, delivery_route, truck.packages,
+                              hub_location).execute(truck)
+            return
+        while truck.get_package_count() > 0:
+            for delivery_stop in delivery_route:
+                dist = graph.get_distance(truck.current_location, delivery_stop)
+                truck.make_delivery_stop(delivery_stop, dist)
+                if truck.get_package_count() == 0:
+                    break
+        distance_to_hub = graph.get_distance(truck.current_location, hub_location)
+
+        truck.return_to_hub(distance_to_hub)
+
+    def get_remaining_packages(self):
+        """
+        filters all packages in package_table that are at the hub to be delivered
+        :return: all packages at hub
+        """
+        return self.package_table.query(status=PackageStatus.AT_HUB)
+
+    def get_priority_packages(self):
+        """
+        filters all priority packages in package_table that are at the hub
+        :return: all priority packages at hub
+        """
+        return self.package_table.query(status=PackageStatus.AT_HUB, deadline_before=time(11))
+
+    def process_special_packages(self):
+        """
+        converts a set of package IDs to package objects by using the package_table.search() lookup function
+        :return: None
+        """
+        delivered_together = {13, 14, 15, 16, 19, 20}
+        truck_2 = {3, 18, 36, 38}
+        delayed = {6, 25, 28, 32}
+        # wrong = {9}
+
+        for package_id in truck_2:
+            self.special_packages_truck_2.add(self.package_table.search(package_id))
+
+        for package_id in delayed:
+            self.special_packages_delayed.add(self.package_table.search(package_id))
+
+        for package_id in delivered_together:
+            self.special_packages_delivered_together.add(self.package_table.search(package_id))
+        wrong_package = self.package_table.search(9)
+        self.special_packages_wrong_address.add(wrong_package)
+
+    def dispatch_standard_truck(self, truck):
+        """
+        dispatches given truck for a standard delivery with no priority or special packages
+        :param truck: truck to dispatch
+        :return: None
+        """
+        packages = self.get_remaining_packages()
+
+        pri_solution, pri_packages, _ = self.determine_solution(packages, self.search_location(self.hub_address), 12,
+                                                                5000, solver='exact', start_time=truck.get_time())
+        filler_packages = self.match_packages_to_locations(pri_solution, self.get_remaining_packages(),
+                                                           10 - len(packages))
+        packages = set(pri_packages).union(set(filler_packages))
+
+        self.dispatch_truck(truck, pri_solution, packages)
+
+    def dispatch_priority_truck(self, truck):
+        """
+        dispatches given truck with a priority package load, this is the first truck used
+        special packages such as those delayed or required to be delivered on truck two are filtered out.
+        :param truck: truck to dispatch
+        :return: None
+        """
+        packages = set(self.get_priority_packages())
+        packages.difference_update(self.special_packages_truck_2)
+        packages.difference_update(self.special_packages_delayed)
+        packages.difference_update(self.special_packages_wrong_address)
+        pri_solution, pri_packages, _ = self.determine_solution(packages, self.search_location(self.hub_address),
+                                                                len(packages), 5000, solver='exact',
+                                                                start_time=truck.get_time())
+        truck.load(packages)
+        packages.clear()
+        filler_packages = set(self.match_packages_to_locations(pri_solution, self.get_remaining_packages(),
+                                                               16 - truck.get_package_count()))
+        packages.update(filler_packages)
+
+        self.dispatch_truck(truck, pri_solution, packages)
+
+    def dispatch_delayed_priority_truck(self, truck):
+        """
+        dispatches truck to deliver delayed priority packages
+        multiple sequences of delivery locations are added to this truck.
+        priority packages are added to the beginning of the delivery route, next followed by specialty packages required
+        to be delivered on truck two. At this stage, additional packages are added whose destinations are already on the
+        delivery route. If the truck is not full, an additional route is appended to the delivery route.
+        :param truck: truck to dispatch
+        :return: None
+        """
+        hub_location = self.search_location(self.hub_address)
+        packages = set(self.get_priority_packages())
+        special_packages = self.special_packages_delayed.union(self.special_packages_truck_2)
+        pri_solution, pri_packages, _ = self.determine_solution(packages, hub_location, len(packages), 5000,
+                                                                solver='exact', start_time=truck.get_time())
+        special_solution, special_packages, _ = self.determine_solution(special_packages, pri_solution[-1],
+                                                                        len(special_packages), 5000, solver='exact')
+        pri_solution.extend(special_solution)
+        packages = set(pri_packages).union(set(special_packages))
+        packages.difference_update(self.special_packages_wrong_address)
+        truck.load(packages)
+        potential_packages = set(self.get_remaining_packages()).difference(self.special_packages_wrong_address)
+        packages.clear()
+        # capacity left once the packages already on the truck and the ones queued in packages are counted
+        remaining_capacity = truck.get_limit() - truck.get_package_count()
+        if remaining_capacity > 0:
+            filler_packages = self.match_packages_to_locations(pri_solution, potential_packages, remaining_capacity)
+            packages.update(filler_packages[:remaining_capacity])
+            remaining_capacity = truck.get_limit() - truck.get_package_count() - len(packages)
+            if remaining_capacity > 0:
+                # adds additional stops to route
+                target_length = 16 - truck.get_package_count()-2
+                new_candidates = set(self.get_remaining_packages()).difference(self.special_packages_wrong_address)
+                new_solution, new_packages, _ = self.determine_solution(new_candidates,
+                                                                        pri_solution[-1],
+                                                                        target_length-1,
+                                                                        5000,
+                                                                        target_length,
+                                                                        solver='exact')
+                pri_solution.extend(new_solution)
+                packages.update([p for p in new_packages if p not in packages][:remaining_capacity])
+
+        self.dispatch_truck(truck, pri_solution, packages)
+
+    def dispatch_fleet(self, trucks, packages=None):
+        """
+        plans routes for every truck with a single FleetSolver call and dispatches them
+        unlike the dispatch functions above, special package constraints are not taken into account
+        :param trucks: trucks to dispatch, each starts at its current time
+        :param packages: packages to deliver, defaults to every package at the hub
+        :return: None
+        """
+        if packages is None:
+            packages = self.get_remaining_packages()
+        plan = FleetSolver(self.destination_graph, self.search_location(self.hub_address)).solve(packages, trucks)
+        for truck, trips in plan.items():
+            for delivery_route, trip_packages in trips:
+                self.dispatch_truck(truck, delivery_route, trip_packages)
+
+    def simulate_fleet(self, trucks, packages=None, hooks=(), delayed_arrival=time(9, 5),
+                       address_corrected_at=time(10, 20), corrected_address='410 S State St'):
+        """
+        plans routes for every truck with FleetSolver and drives them in one FleetSimulator run on a shared clock
+        the delayed special packages only reach the hub at delayed_arrival, trips carrying them wait for it. The wrong
+        address packages are delivered to corrected_address on a trip of their own, held at the hub like a late arrival
+        until address_corrected_at, so they are never driven before their address is known.
+        like dispatch_fleet, the truck 2 only and delivered together constraints are not taken into account
+        :param trucks: trucks to dispatch, each trip departs no earlier than its truck's current time
+        :param packages: packages to deliver, defaults to every package at the hub
+        :param hooks: functions called with every SimulationEvent
+        :param delayed_arrival: time of day the delayed packages arrive, None if they are already at the hub
+        :param address_corrected_at: time of day the wrong address packages are corrected, None if they already are
+        :param corrected_address: the address the wrong address packages are delivered to
+        :return: the FleetSimulator after the run
+        """
+        if packages is None:
+            packages = self.get_remaining_packages()
+        hub_location = self.search_location(self.hub_address)
+        simulator = FleetSimulator(self.destination_graph, hub_location, min(truck.get_time() for truck in trucks))
+        for hook in hooks:
+            simulator.add_hook(hook)
+        if delayed_arrival is not None:
+            delayed = [package for package in packages if package in self.special_packages_delayed]
+            arrival_time = datetime.combine(simulator.current_time.date(), delayed_arrival)
+            if delayed:
+                simulator.schedule_arrival(arrival_time, delayed)
+        wrong_address = []
+        if address_corrected_at is not None:
+            wrong_address = [package for package in packages if package in self.special_packages_wrong_address]
+            corrected_time = datetime.combine(simulator.current_time.date(), address_corrected_at)
+            for package in wrong_address:
+                self.correct_package_address(package, corrected_address)
+            if wrong_address:
+                simulator.schedule_arrival(corrected_time, wrong_address)
+        solver = FleetSolver(self.destination_graph, hub_location)
+        plan = solver.solve([package for package in packages if package not in wrong_address], trucks)
+        for truck, trips in plan.items():
+            departure_time = truck.get_time()
+            for delivery_route, trip_packages in trips:
+                simulator.schedule_trip(truck, delivery_route, trip_packages, departure_time)
+        if wrong_address:
+            # planned apart and queued after every other trip, so only a trip of their own waits for the correction
+            for truck, trips in solver.solve(wrong_address, trucks).items():
+                for delivery_route, trip_packages in trips:
+                    simulator.schedule_trip(truck, delivery_route, trip_packages, corrected_time)
+        simulator.run()
+        return simulator
@@ -0,0 +1,176 @@
+class RouteImprover:
+    """
+    Improves delivery routes with 2-opt, Or-opt and relocate moves until no move shortens the route (a local optimum)
+
+    A route is a sequence of locations visited after start_location. If end_location is given the route is closed,
+    it has to finish at end_location (usually the hub) and that last leg counts towards its distance; otherwise it is
+    an open path ending at its last stop.
+
+    The distances between the locations of a route are copied into a small index based table up front, so every move is
+    evaluated in O(1) from the handful of edges it adds and removes. One pass over all moves is O(N^2) for N stops.
+    Distances are assumed to be symmetric, as they are in DestinationGraph.
+
+    With a RouteTiming, a move that shortens the route is only made if it does not add to the route's total minutes
+    late. That check walks the whole route, but it only runs for moves that already passed the O(1) distance check.
+    """
+
+    def __init__(self, graph, start_location, end_location=None, max_segment_length=3, timing=None):
+        """
+        :param graph: graph providing get_distance between any two locations
+        :param start_location: the fixed first location of the route
+        :param end_location: optional fixed final location, makes the route closed
+        :param max_segment_length: longest segment Or-opt moves at once
+        :param timing: optional RouteTiming whose windows moves must not make worse
+        """
+        self.graph = graph
+        self.start_location = start_location
+        self.end_location = end_location
+        self.max_segment_length = max_segment_length
+        self.timing = timing
+        self.nodes = []
+        self.minutes_late = 0
+
+    def route_distance(self, route):
+        """
+        :param route: sequence of locations visited after start_location
+        :return: total distance of the route, including the leg to end_location when closed
+        """
+        stops = [self.start_location] + list(route)
+        if self.end_location is not None:
+            stops.append(self.end_location)
+        return sum(self.graph.get_distance(stops[i], stops[i + 1]) for i in range(len(stops) - 1))
+
+    def solve(self, locations, path_length=None):
+        """
+        uses the improver as the primary solver, a nearest neighbour route is built and then improved
+        :param locations: locations to visit
+        :param path_length: optional maximum number of stops, the nearest are kept
+        :return: improved route as a list of locations
+        """
+        remaining = set(locations)
+        remaining.discard(self.start_location)
+        route = []
+        current_location = self.start_location
+        while remaining and (path_length is None or len(route) < path_length):
+            # ties are broken by address so the construction does not depend on set order
+            current_location = min(remaining, key=lambda x: (self.graph.get_distance(current_location, x), x.address))
+            route.append(current_location)
+            remaining.remove(current_location)
+        return self.improve(route)
+
+    def improve(self, route):
+        """
+        applies improving 2-opt, Or-opt and relocate moves until none are left
+        :param route: sequence of locations visited after start_location
+        :return: improved route as a new list of locations
+        """
+        nodes = [self.start_location] + list(route)
+        if self.end_location is not None:
+            nodes.append(self.end_location)
+        distances = [[self.graph.get_distance(a, b) if a is not b else 0 for b in nodes] for a in nodes]
+        # tour holds indices into nodes, position 0 and (for closed routes) the last position never move
+        tour = list(range(len(nodes)))
+        self.nodes = nodes
+        if self.timing is not None:
+            self.minutes_late = self.timing.lateness(route)[1]
+        while self.two_opt(tour, distances) or self.relocate(tour, distances) or self.or_opt(tour, distances):
+            pass
+        return [nodes[i] for i in tour[1:len(route) + 1]]
+
+    def accepts(self, tour):
+        """
+        checks a candidate tour against the timing windows
+        :param tour: candidate tour of indices into nodes
+        :return: True if there is no timing or the tour is no later in total than the current one
+        """
+        if self.timing is None:
+            return True
+        minutes_late = self.timing.lateness([self.nodes[i] for i in tour[1:self.last_movable(tour) + 1]])[1]
+        if minutes_late > self.minutes_late:
+            return False
+        self.minutes_late = minutes_late
+        return True
+
+    def last_movable(self, tour):
+        return len(tour) - 2 if self.end_location is not None else len(tour) - 1
+
+    @staticmethod
+    def leg(distances, tour, a, b):
+        """
+        :return: the distance from the location at tour position a to the one at position b, 0 when b is past the end of
+        an open route
+        """
+        if b >= len(tour):
+            return 0
+        return distances[tour[a]][tour[b]]
+
+    def two_opt(self, tour, distances):
+        """
+        reverses the first segment found whose reversal shortens the tour
+        :return: True if a move was made
+        """
+        last = self.last_movable(tour)
+        leg = self.leg
+        for i in range(1, last):
+            for j in range(i + 1, last + 1):
+                delta = (distances[tour[i - 1]][tour[j]] + leg(distances, tour, i, j + 1)
+                         - distances[tour[i - 1]][tour[i]] - leg(distances, tour, j, j + 1))
+                if delta < -1e-9:
+                    candidate = tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+                    if self.accepts(candidate):
+                        tour[:] = candidate
+                        return True
+        return False
+
+    def move_segment(self, tour, distances, segment_length):
+        """
+        moves the first segment of segment_length stops found whose move, in either direction, shortens the tour
+        :return: True if a move was made
+        """
+        last = self.last_movable(tour)
+        for i in range(1, last - segment_length + 2):
+            k = i + segment_length - 1
+            before = tour[i - 1]
+            first = tour[i]
+            final = tour[k]
+            after = tour[k + 1] if k + 1 < len(tour) else None
+            removal_gain = distances[before][first] + (distances[final][after] if after is not None else 0)
+            if after is not None:
+                removal_gain -= distances[before][after]
+            # insert between positions j and j + 1 of the tour once the segment is taken out
+            for j in range(0, last + 1):
+                if i - 1 <= j <= k:
+                    continue
+                x = tour[j]
+                y = tour[j + 1] if j + 1 < len(tour) else None
+                bridge = distances[x][y] if y is not None else 0
+                forward = distances[x][first] + (distances[final][y] if y is not None else 0) - bridge
+                backward = distances[x][final] + (distances[first][y] if y is not None else 0) - bridge
+                if min(forward, backward) - removal_gain < -1e-9:
+                    segment = tour[i:k + 1]
+                    if backward < forward:
+                        segment.reverse()
+                    candidate = tour[:i] + tour[k + 1:]
+                    insert_at = j + 1 if j < i else j + 1 - segment_length
+                    candidate[insert_at:insert_at] = segment
+                    if self.accepts(candidate):
+                        tour[:] = candidate
+                        return True
+        return False
+
+    def relocate(self, tour, distances):
+        """
+        moves a single stop to the position that shortens the tour
+        :return: True if a move was made
+        """
+        return self.move_segment(tour, distances, 1)
+
+    def or_opt(self, tour, distances):
+        """
+        moves a chain of 2 up to max_segment_length consecutive stops to another position in the tour
+        :return: True if a move was made
+        """
+        for segment_length in range(2, self.max_segment_length + 1):
+            if self.move_segment(tour, distances, segment_length):
+                return True
+        return False
@@ -0,0 +1,135 @@
+from datetime import datetime
+from datetime import timedelta
+import numpy as np
+
+
+class RoutePlan:
+    """
+    A route compiled into arrays for one load of packages
+
+    compile() walks the route the way dispatch_truck drives it: stops equal to the truck's current location are
+    skipped and the route is looped until every package is delivered. The walk ends at the last delivery, after which
+    the truck heads back to the hub. The result is held as arrays over the stops actually driven:
+        stops           location indices into the DistanceMatrix
+        legs            miles driven to reach each stop
+        miles           cumulative miles at each stop
+        minutes         cumulative whole minutes at each stop, every leg rounded like TimeKeeper.advance_time
+        package_stops   for each package, the position in stops it is delivered at
+    plus the leg back to the hub. Timing a plan for another departure is an addition over the minutes array, checking
+    deadlines is one comparison over all packages.
+    """
+
+    def __init__(self, distance_matrix, packages, stops, legs, package_stops, return_leg, speed=18):
+        self.distance_matrix = distance_matrix
+        self.packages = list(packages)
+        self.stops = stops
+        self.legs = legs
+        self.miles = np.cumsum(legs)
+        self.minutes = np.cumsum(np.round(legs * 60 / speed).astype(np.int64))
+        self.package_stops = package_stops
+        self.return_leg = return_leg
+        self.return_minutes = int(round(return_leg * 60 / speed))
+        self.speed = speed
+
+    @classmethod
+    def compile(cls, distance_matrix, start_location, route, packages, end_location=None, speed=18):
+        """
+        :param distance_matrix: DistanceMatrix covering every location of route
+        :param start_location: location the truck leaves from
+        :param route: sequence of locations the truck follows, looped until every package is delivered
+        :param packages: packages on the truck
+        :param end_location: location the truck returns to after the last delivery, None for no return leg
+        :param speed: truck speed in miles per hour
+        :return: RoutePlan
+        """
+        packages = list(packages)
+        route = [location for location in route if location is not None]
+        undelivered = {package.location for package in packages}
+        missing = undelivered.difference(route)
+        if missing:
+            raise ValueError(str('route does not visit %s' % ', '.join(sorted(l.address for l in missing))))
+        stops = []
+        delivered_at = {}
+        current_location = start_location
+        while undelivered:
+            for location in route:
+                if location is current_location:
+                    continue
+                if location in undelivered:
+                    undelivered.discard(location)
+                    delivered_at[location] = len(stops)
+                stops.append(location)
+                current_location = location
+                if not undelivered:
+                    break
+            else:
+                if not stops:
+                    raise ValueError(str('route never leaves %s' % start_location.address))
+        matrix = distance_matrix.matrix
+        indices = distance_matrix.indices([start_location] + stops)
+        legs = matrix[indices[:-1], indices[1:]]
+        return_leg = 0.0
+        if end_location is not None:
+            return_leg = float(matrix[indices[-1], distance_matrix.index_of(end_location)])
+        package_stops = np.array([delivered_at[package.location] for package in packages], dtype=np.intp)
+        return cls(distance_matrix, packages, indices[1:], legs, package_stops, return_leg, speed)
+
+    def __len__(self):
+        return len(self.stops)
+
+    def locations(self):
+        """
+        :return: the locations of the stops in driving order
+        """
+        return [self.distance_matrix.location_at(index) for index in self.stops]
+
+    def total_distance(self):
+        """
+        :return: miles from the start to the last stop and back
+        """
+        return (float(self.miles[-1]) if len(self.miles) else 0.0) + self.return_leg
+
+    def total_minutes(self):
+        return (int(self.minutes[-1]) if len(self.minutes) else 0) + self.return_minutes
+
+    def etas(self, departure):
+        """
+        :param departure: datetime the truck leaves
+        :return: list of the arrival time at every stop
+        """
+        return [departure + timedelta(minutes=int(minutes)) for minutes in self.minutes]
+
+    def delivery_times(self, departure):
+        """
+        :param departure: datetime the truck leaves
+        :return: list of the delivery time of every package, in the order of packages
+        """
+        return [departure + timedelta(minutes=int(minutes)) for minutes in self.minutes[self.package_stops]]
+
+    def late_packages(self, departure):
+        """
+        checks every package deadline, package deadlines only hold a time of day and are moved to the date of departure
+        :param departure: datetime the truck leaves
+        :return: list of packages delivered after their deadline
+        """
+        if not self.packages:
+            return []
+        # minutes after departure each package is due
+        deadlines = np.array([(datetime.combine(departure.date(), package.deadline.time()) - departure).total_seconds()
+                              for package in self.packages]) / 60
+        late = self.minutes[self.package_stops] > deadlines
+        return [package for package, is_late in zip(self.packages, late) if is_late]
+
+    def execute(self, truck):
+        """
+        drives a loaded truck along the plan with the precomputed legs and returns it to the hub
+        :param truck: truck carrying the plan's packages, its clock is the departure time
+        :return: None
+        """
+        locations = self.locations()
+        for location, leg in zip(locations, self.legs.tolist()):
+            truck.make_delivery_stop(location, leg)
+        if truck.get_package_count():
+            raise ValueError(str('%s still has packages after its route' % truck.name))
+        truck.return_to_hub(self.return_leg)
+
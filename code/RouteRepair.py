@@ -0,0 +1,222 @@
+from RouteImprover import RouteImprover
+
+
+class RouteChange:
+    """
+    Result of a RouteRepair operation
+
+    route is the repaired route, distance_delta the change in miles and minutes_delta the change in minutes until the
+    route is finished, at end_location for a closed route. eta_deltas maps every stop on both the old and the new route
+    to the minutes its arrival moved by, a positive delta arrives later. position is where the change was made in the
+    old route, None if the route was left as it was.
+    """
+
+    __slots__ = ('route', 'distance_delta', 'minutes_delta', 'eta_deltas', 'position')
+
+    def __init__(self, route, distance_delta=0, minutes_delta=0, eta_deltas=None, position=None):
+        self.route = route
+        self.distance_delta = distance_delta
+        self.minutes_delta = minutes_delta
+        self.eta_deltas = eta_deltas or {}
+        self.position = position
+
+    def changed(self):
+        return self.position is not None
+
+    def __str__(self):
+        return str('%+.1f miles, %+d minutes, %s stops' % (self.distance_delta, self.minutes_delta, len(self.route)))
+
+
+class RouteRepair:
+    """
+    Changes a planned route in place of planning it again
+
+    A route is a sequence of locations visited after start_location, like the routes of determine_solution. For a trip
+    that is already being driven, start_location is where the truck is headed next and the route holds the stops left
+    after it, see FleetSimulator.remaining_route.
+
+    A new stop is put where it adds the fewest miles (cheapest insertion), a stop no longer needed is taken out. Either
+    way only the window stops on each side of the change are then re-optimized with RouteImprover, between the fixed
+    stops around them, so the rest of the plan keeps its order and a repair costs O(N) for N stops plus a local search
+    over at most 2 * window + 1 stops.
+
+    With a RouteTiming the insertion position that adds the least lateness is chosen, ties going to the fewest added
+    miles, and the local re-optimization is kept only if it does not make the route later in total. Each lateness
+    check is O(N), positions are checked fewest added miles first and the search ends at the first one that adds no
+    lateness, so only a stop that cannot be put anywhere on time costs O(N^2).
+
+    The route always ends at end_location, a location equal to start_location or end_location is never inserted.
+    """
+
+    def __init__(self, graph, start_location, end_location=None, timing=None, window=3, speed=18):
+        """
+        :param graph: graph providing get_distance between any two locations
+        :param start_location: location the route leaves from
+        :param end_location: optional location the route has to finish at, usually the hub
+        :param timing: optional RouteTiming starting at start_location, used for ETAs and deadline checks
+        :param window: stops on each side of a change that may be reordered
+        :param speed: truck speed in miles per hour, used for ETAs when there is no timing
+        """
+        self.graph = graph
+        self.start_location = start_location
+        self.end_location = end_location
+        self.timing = timing
+        self.window = window
+        self.speed = speed
+
+    def distance(self, origin, destination):
+        if origin is None or destination is None or origin is destination:
+            return 0
+        return self.graph.get_distance(origin, destination)
+
+    def route_distance(self, route):
+        stops = [self.start_location] + list(route) + [self.end_location]
+        return sum(self.distance(stops[i], stops[i + 1]) for i in range(len(stops) - 1))
+
+    def minutes_late(self, route):
+        return self.timing.lateness(route)[1] if self.timing else 0
+
+    def arrival_minutes(self, route):
+        """
+        :param route: sequence of locations visited after start_location
+        :return: a tuple of a dict of each stop to the minutes after the start it is first reached at, and the minutes
+        the route is finished at
+        """
+        arrivals = {}
+        if self.timing:
+            start_time = self.timing.start_time
+            etas = self.timing.etas(route)
+            for location, eta in zip(route, etas):
+                arrivals.setdefault(location, (eta - start_time).total_seconds() / 60)
+            finished = (etas[-1] - start_time).total_seconds() / 60 if etas else 0
+            last_location = route[-1] if route else self.start_location
+            return arrivals, finished + self.leg_minutes(last_location, self.end_location)
+        minutes = 0
+        current_location = self.start_location
+        for location in route:
+            minutes += self.leg_minutes(current_location, location)
+            arrivals.setdefault(location, minutes)
+            current_location = location
+        return arrivals, minutes + self.leg_minutes(current_location, self.end_location)
+
+    def leg_minutes(self, origin, destination):
+        return round(self.distance(origin, destination) * 60 / self.speed)
+
+    def change(self, route, new_route, position):
+        """
+        :return: RouteChange from route to new_route
+        """
+        old_arrivals, old_finished = self.arrival_minutes(route)
+        new_arrivals, new_finished = self.arrival_minutes(new_route)
+        eta_deltas = {location: new_arrivals[location] - minutes for location, minutes in old_arrivals.items()
+                      if location in new_arrivals and new_arrivals[location] != minutes}
+        return RouteChange(new_route, self.route_distance(new_route) - self.route_distance(route),
+                           new_finished - old_finished, eta_deltas, position)
+
+    def insertion_position(self, route, location):
+        """
+        :param route: sequence of locations visited after start_location
+        :param location: location to add
+        :return: the index location is inserted at
+        """
+        stops = [self.start_location] + list(route) + [self.end_location]
+        candidates = []
+        for position in range(len(route) + 1):
+            before, after = stops[position], stops[position + 1]
+            added_miles = (self.distance(before, location) + self.distance(location, after)
+                           - self.distance(before, after))
+            candidates.append((added_miles, position))
+        if not self.timing:
+            return min(candidates)[1]
+        # adding a stop only delays the ones after it, so the route is never less late than it is without location
+        least_late = self.minutes_late(route)
+        best_position = None
+        best_cost = None
+        for added_miles, position in sorted(candidates):
+            if best_cost is not None and best_cost[0] <= least_late:
+                break
+            cost = (self.minutes_late(route[:position] + [location] + route[position:]), added_miles)
+            if best_cost is None or cost < best_cost:
+                best_position, best_cost = position, cost
+        return best_position
+
+    def reoptimize(self, route, position):
+        """
+        reorders the window stops on each side of position, the stops around them stay fixed
+        :param route: sequence of locations visited after start_location
+        :param position: index of the change in route
+        :return: the route with its window re-optimized, route itself if that does not help
+        """
+        low = max(0, position - self.window)
+        high = min(len(route), position + self.window + 1)
+        if high - low < 2:
+            return route
+        before = self.start_location if low == 0 else route[low - 1]
+        after = self.end_location if high == len(route) else route[high]
+        segment = RouteImprover(self.graph, before, after).improve(route[low:high])
+        candidate = route[:low] + segment + route[high:]
+        if self.timing and self.minutes_late(candidate) > self.minutes_late(route):
+            return route
+        return candidate
+
+    def insert(self, route, location):
+        """
+        :param route: sequence of locations visited after start_location
+        :param location: location to visit as well
+        :return: RouteChange, unchanged if the route already visits location or starts or ends there
+        """
+        route = list(route)
+        if location in route or location is self.start_location or location is self.end_location:
+            return RouteChange(route)
+        position = self.insertion_position(route, location)
+        new_route = route[:position] + [location] + route[position:]
+        return self.change(route, self.reoptimize(new_route, position), position)
+
+    def remove(self, route, location):
+        """
+        :param route: sequence of locations visited after start_location
+        :param location: location that no longer needs a visit, every visit to it is taken out
+        :return: RouteChange, unchanged if the route does not visit location
+        """
+        route = list(route)
+        if location not in route:
+            return RouteChange(route)
+        position = route.index(location)
+        new_route = [stop for stop in route if stop is not location]
+        return self.change(route, self.reoptimize(new_route, min(position, len(new_route) - 1)), position)
+
+    def insert_package(self, route, package):
+        """
+        adds a stop for package, e.g. a package arriving late that is put on a planned trip
+        :return: RouteChange
+        """
+        return self.insert(route, package.location)
+
+    def remove_package(self, route, package, packages, location=None):
+        """
+        takes out the stop of package unless another of packages is delivered there as well
+        :param packages: packages the route still delivers, with or without package
+        :param location: the stop to take out, defaults to package.location
+        :return: RouteChange
+        """
+        location = location or package.location
+        if any(other is not package and other.location is location for other in packages):
+            return RouteChange(list(route))
+        return self.remove(route, location)
+
+    def relocate_package(self, route, package, new_location, packages, old_location=None):
+        """
+        moves the delivery of package to new_location, e.g. for an address correction
+        package.location is not changed here, see Planner.correct_package_address. When it has already been changed,
+        old_location is the location the route delivered package at.
+        :param packages: packages the route still delivers, with or without package
+        :param old_location: defaults to package.location
+        :return: RouteChange from route to the route delivering package at new_location
+        """
+        route = list(route)
+        removed = self.remove_package(route, package, packages, old_location)
+        inserted = self.insert(removed.route, new_location)
+        if not removed.changed() and not inserted.changed():
+            return RouteChange(route)
+        position = removed.position if removed.changed() else inserted.position
+        return self.change(route, inserted.route, position)
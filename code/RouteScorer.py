@@ -0,0 +1,85 @@
+import numpy as np
+
+
+class RouteScorer:
+    """
+    Scores many candidate routes at once against a DistanceMatrix
+
+    Candidates are an (N x L) integer array of location indices, one route per row. Every leg of every route is fetched
+    with a single NumPy gather over the distance matrix and summed per row, so scoring N routes is a handful of array
+    operations instead of N * L dict lookups.
+
+    Routes shorter than L are padded at the end with -1. Padding is replaced by the route's last stop, which turns the
+    padded legs into zero length legs from a stop to itself. A row of only -1 is an empty route, it is scored as the leg
+    from start to end, 0 without both.
+    """
+
+    def __init__(self, distance_matrix):
+        """
+        :param distance_matrix: DistanceMatrix the route indices refer to
+        """
+        self.distance_matrix = distance_matrix
+
+    def to_indices(self, routes):
+        """
+        converts routes of locations to the padded index array score expects
+        :param routes: a sequence of routes, each a sequence of locations
+        :return: an (N x L) NumPy integer array, L being the longest route, padded with -1
+        """
+        routes = list(routes)
+        length = max((len(route) for route in routes), default=0)
+        indices = np.full((len(routes), length), -1, dtype=np.intp)
+        for i, route in enumerate(routes):
+            indices[i, :len(route)] = self.distance_matrix.indices(route)
+        return indices
+
+    @staticmethod
+    def fill_padding(routes):
+        """
+        :param routes: (N x L) integer array padded with -1
+        :return: a copy of routes with each -1 replaced by the last stop before it, a row without stops stays -1
+        """
+        routes = np.array(routes, dtype=np.intp)
+        if routes.size == 0:
+            return routes
+        valid = routes >= 0
+        # column index of the most recent valid stop at every position
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(routes.shape[1]), 0), axis=1)
+        return np.take_along_axis(routes, last_valid, axis=1)
+
+    def score(self, routes, start=None, end=None):
+        """
+        computes the total distance of every route
+        :param routes: (N x L) integer array of location indices, padded with -1, or a sequence of such rows
+        :param start: optional location index every route leaves from, adds the leg to each route's first stop
+        :param end: optional location index every route returns to (usually the hub), adds the leg from each route's
+        last stop
+        :return: a NumPy array of N total distances
+        """
+        routes = self.fill_padding(np.atleast_2d(routes))
+        matrix = self.distance_matrix.matrix
+        empty_leg = matrix[start, end] if start is not None and end is not None else 0.0
+        if routes.shape[1] == 0:
+            return np.full(routes.shape[0], empty_leg, dtype=np.float64)
+        # padding only follows stops, so a route without a first stop has none, its -1s must not index the matrix
+        empty = routes[:, 0] < 0
+        routes[empty] = 0
+        totals = matrix[routes[:, :-1], routes[:, 1:]].sum(axis=1)
+        if start is not None:
+            totals += matrix[start, routes[:, 0]]
+        if end is not None:
+            totals += matrix[routes[:, -1], end]
+        totals[empty] = empty_leg
+        return totals
+
+    def score_locations(self, routes, start_location=None, end_location=None):
+        """
+        score for routes given as locations
+        :param routes: a sequence of routes, each a sequence of locations
+        :param start_location: optional location every route leaves from
+        :param end_location: optional location every route returns to
+        :return: a NumPy array of total distances in the same order as routes
+        """
+        start = self.distance_matrix.index_of(start_location) if start_location is not None else None
+        end = self.distance_matrix.index_of(end_location) if end_location is not None else None
+        return self.score(self.to_indices(routes), start, end)
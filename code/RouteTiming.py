@@ -0,0 +1,126 @@
+from datetime import datetime
+from datetime import timedelta
+
+
+class RouteTiming:
+    """
+    Computes arrival times along routes and checks them against time windows
+
+    windows maps a location to an (earliest, latest) tuple of datetimes, either may be None. A truck arriving before
+    earliest waits until then, arriving after latest is late by the difference. Legs are timed the way TimeKeeper
+    advances a truck's clock, rounded to whole minutes at the given speed, so the arrival times match what dispatching
+    the route produces.
+    """
+
+    def __init__(self, graph, start_location, start_time, windows, speed=18):
+        """
+        :param graph: graph providing get_distance between any two locations
+        :param start_location: location the route leaves from
+        :param start_time: datetime the route leaves at
+        :param windows: dict of location to an (earliest, latest) tuple of datetimes
+        :param speed: truck speed in miles per hour
+        """
+        self.graph = graph
+        self.start_location = start_location
+        self.start_time = start_time
+        self.windows = windows
+        self.speed = speed
+
+    @classmethod
+    def from_packages(cls, graph, start_location, start_time, packages, speed=18):
+        """
+        builds deadline windows from packages, a location has to be reached by the earliest deadline of its packages
+        package deadlines only hold a time of day, they are moved to the date of start_time
+        :param graph: graph providing get_distance between any two locations
+        :param start_location: location the route leaves from
+        :param start_time: datetime the route leaves at
+        :param packages: packages whose deadlines apply
+        :param speed: truck speed in miles per hour
+        :return: RouteTiming
+        """
+        windows = {}
+        for package in packages:
+            if package.deadline is None:
+                continue
+            deadline = datetime.combine(start_time.date(), package.deadline.time())
+            current = windows.get(package.location)
+            if current is None or deadline < current[1]:
+                windows[package.location] = (None, deadline)
+        return cls(graph, start_location, start_time, windows, speed)
+
+    def leg_minutes(self, origin, destination):
+        """
+        :return: whole minutes it takes to drive from origin to destination
+        """
+        return round(self.graph.get_distance(origin, destination) * 60 / self.speed)
+
+    def arrive(self, arrival, location):
+        """
+        :param arrival: time the truck reaches location
+        :param location: the location reached
+        :return: a tuple of the time service starts, after any wait for the window to open, and the minutes late
+        """
+        earliest, latest = self.windows.get(location, (None, None))
+        if earliest is not None and arrival < earliest:
+            arrival = earliest
+        if latest is not None and arrival > latest:
+            return arrival, (arrival - latest).total_seconds() / 60
+        return arrival, 0
+
+    def etas(self, route):
+        """
+        :param route: sequence of locations visited after start_location
+        :return: list of the time service starts at each stop of route
+        """
+        times = []
+        current_time = self.start_time
+        current_location = self.start_location
+        for location in route:
+            current_time += timedelta(minutes=self.leg_minutes(current_location, location))
+            current_time = self.arrive(current_time, location)[0]
+            times.append(current_time)
+            current_location = location
+        return times
+
+    def first_late_stop(self, route):
+        """
+        finds where a route becomes infeasible, lets callers abandon a partial route as soon as it is
+        :param route: sequence of locations visited after start_location
+        :return: index of the first stop reached after its window closes, or None if every stop is on time
+        """
+        current_time = self.start_time
+        current_location = self.start_location
+        visited = set()
+        for i, location in enumerate(route):
+            current_time += timedelta(minutes=self.leg_minutes(current_location, location))
+            current_time, minutes_late = self.arrive(current_time, location)
+            if minutes_late > 0 and location not in visited:
+                return i
+            visited.add(location)
+            current_location = location
+        return None
+
+    def lateness(self, route):
+        """
+        :param route: sequence of locations visited after start_location
+        :return: a tuple of the number of late stops, the total minutes late and the most minutes late at one stop
+        """
+        late_stops = 0
+        total_minutes = 0
+        max_minutes = 0
+        current_time = self.start_time
+        current_location = self.start_location
+        visited = set()
+        for location in route:
+            current_time += timedelta(minutes=self.leg_minutes(current_location, location))
+            current_time, minutes_late = self.arrive(current_time, location)
+            current_location = location
+            # a location passed through more than once is served on the first visit
+            if location in visited:
+                continue
+            visited.add(location)
+            if minutes_late > 0:
+                late_stops += 1
+                total_minutes += minutes_late
+                max_minutes = max(max_minutes, minutes_late)
+        return late_stops, total_minutes, max_minutes
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import time as clock
+import weakref
+from collections import OrderedDict
+from MetricsRegistry import metrics
+
+
+class SolutionCache:
+    """
+    Remembers solved routes by graph, start address, set of stop addresses and solver settings
+
+    Locations are identified by address rather than by object and graphs by graph_fingerprint, so a route solved by one
+    planner is found by any other planner on the same distance table, including one in a later run that loaded the
+    cache from disk, while planners on different tables sharing one cache never see each other's routes. A graph's
+    fingerprint is computed the first time the cache sees the graph and assumed not to change afterwards.
+
+    Entries are kept in least recently used order: a hit moves its entry to the back and once more than max_entries are
+    stored the front entry is evicted. Entries older than max_age seconds are dropped when they are next looked up or
+    when evict_expired() runs. Routes are stored as tuples and handed out as new lists, so callers may extend the route
+    they get without changing the cache.
+
+    The settings are part of the key because the same stops give different routes with a different solver, seed or
+    deadlines, they have to be hashable and, for persistence, made of strings, numbers, None and nested tuples.
+
+    With a file_path the cache can be saved to and loaded from a JSON file, every route is stored with the fingerprint
+    of the graph it was solved on.
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, max_entries=256, max_age=None, file_path=None):
+        """
+        :param max_entries: most routes held at once
+        :param max_age: seconds a route stays valid, None keeps routes until they are evicted
+        :param file_path: optional JSON file for save() and load()
+        """
+        if max_entries < 1:
+            raise ValueError(str('max_entries has to be at least 1, got %s' % max_entries))
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.file_path = file_path
+        # (graph fingerprint, start address, frozenset of stop addresses, settings) -> (created, tuple of route
+        # addresses)
+        self.entries = OrderedDict()
+        # graph -> graph_fingerprint(graph), so a lookup does not hash every edge again
+        self.fingerprints = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(fingerprint, start_address, stops, settings):
+        return fingerprint, start_address, frozenset(stops), settings
+
+    def fingerprint(self, graph):
+        """
+        :param graph: DestinationGraph
+        :return: graph_fingerprint of graph, computed once per graph
+        """
+        fingerprint = self.fingerprints.get(graph)
+        if fingerprint is None:
+            fingerprint = self.graph_fingerprint(graph)
+            self.fingerprints[graph] = fingerprint
+        return fingerprint
+
+    def expired(self, created, now):
+        return self.max_age is not None and now - created > self.max_age
+
+    def get(self, graph, start_address, stops, settings):
+        """
+        :param graph: the graph the route is planned on
+        :param start_address: address the route leaves from
+        :param stops: addresses the route visits
+        :param settings: hashable solver settings
+        :return: a new list of the addresses of the cached route, or None on a miss
+        """
+        key = self.key(self.fingerprint(graph), start_address, stops, settings)
+        entry = self.entries.get(key)
+        if entry is not None and self.expired(entry[0], clock.time()):
+            del self.entries[key]
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            if metrics.enabled:
+                metrics.increment('solution_cache_misses_total')
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        if metrics.enabled:
+            metrics.increment('solution_cache_hits_total')
+        return list(entry[1])
+
+    def put(self, graph, start_address, stops, settings, route, created=None):
+        """
+        stores route, evicting the least recently used routes while the cache is over max_entries
+        :param graph: the graph the route was solved on, or its graph_fingerprint
+        :param start_address: address the route leaves from
+        :param stops: addresses the route visits
+        :param settings: hashable solver settings
+        :param route: sequence of addresses
+        :param created: time.time() the route was solved at, defaults to now
+        :return: None
+        """
+        fingerprint = graph if isinstance(graph, str) else self.fingerprint(graph)
+        key = self.key(fingerprint, start_address, stops, settings)
+        self.entries[key] = (clock.time() if created is None else created, tuple(route))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def evict_expired(self):
+        """
+        drops every route older than max_age
+        :return: number of routes dropped
+        """
+        now = clock.time()
+        expired = [key for key, (created, _) in self.entries.items() if self.expired(created, now)]
+        for key in expired:
+            del self.entries[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def clear(self):
+        self.entries.clear()
+
+    def statistics(self):
+        """
+        :return: a dict of the hit, miss, eviction and expiration counts, the hit rate and the number of routes held
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def graph_fingerprint(graph):
+        """
+        :param graph: DestinationGraph
+        :return: hex sha256 of every edge of graph by address, equal graphs give equal fingerprints
+        """
+        digest = hashlib.sha256()
+        for origin, destination, distance in sorted((origin.address, destination.address, distance)
+                                                    for (origin, destination), distance in graph.edge_weights.items()):
+            digest.update(('%s\t%s\t%r\n' % (origin, destination, distance)).encode())
+        return digest.hexdigest()
+
+    def save(self, file_path=None):
+        """
+        writes every route that has not expired, to a temporary name first which is then moved into place
+        :param file_path: defaults to the file_path the cache was created with
+        :return: None
+        """
+        file_path = file_path or self.file_path
+        if file_path is None:
+            raise ValueError('no file_path to save the solution cache to')
+        self.evict_expired()
+        entries = [{'graph': fingerprint, 'start': start_address, 'stops': sorted(stops), 'settings': settings,
+                    'route': list(route), 'created': created}
+                   for (fingerprint, start_address, stops, settings), (created, route) in self.entries.items()]
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = '%s.%s.tmp' % (file_path, os.getpid())
+        with open(temporary_path, 'w') as cache_file:
+            json.dump({'version': self.FORMAT_VERSION, 'entries': entries}, cache_file)
+        os.replace(temporary_path, file_path)
+
+    def load(self, file_path=None):
+        """
+        adds the saved routes, in their saved order so the most recently used stay at the back
+        a missing file or a file of another format version is skipped
+        :param file_path: defaults to the file_path the cache was created with
+        :return: number of routes loaded
+        """
+        file_path = file_path or self.file_path
+        if file_path is None or not os.path.exists(file_path):
+            return 0
+        with open(file_path) as cache_file:
+            saved = json.load(cache_file)
+        if saved.get('version') != self.FORMAT_VERSION:
+            return 0
+        now = clock.time()
+        loaded = 0
+        for entry in saved['entries']:
+            if self.expired(entry['created'], now):
+                continue
+            self.put(entry['graph'], entry['start'], entry['stops'], as_tuple(entry['settings']), entry['route'],
+                     entry['created'])
+            loaded += 1
+        return loaded
+
+
+def as_tuple(value):
+    """
+    turns the lists JSON made of settings tuples back into tuples
+    """
+    if isinstance(value, list):
+        return tuple(as_tuple(item) for item in value)
+    return value
@@ -0,0 +1,167 @@
+import math
+from array import array
+
+
+class SparseGraph:
+    """
+    Sparse, index based graph for road networks
+
+    DestinationGraph keeps a Python list per location and a dict entry per edge direction, which suits the small
+    complete graph of the distance table but not a street network of hundreds of thousands of intersections. This
+    backend gives every location an integer index and stores the edges in compressed sparse row (CSR) form, three flat
+    typed arrays:
+        offsets     offsets[i] to offsets[i + 1] is the range of the edges leaving location i, one more entry than
+                    there are locations
+        targets     index of the location each edge leads to
+        weights     distance of each edge
+    so memory is linear in the number of edges, a few bytes per edge instead of several Python objects. Directed graphs
+    also keep the reverse edges in the same form for searches running backwards from a target, an undirected graph is
+    its own reverse.
+
+    Locations with coordinates give A* its heuristic. Coordinates are planar (x, y) pairs, heuristic_scale converts
+    straight line distance to a lower bound of the edge distance and is derived from the edges so the heuristic never
+    overestimates, see admissible_scale().
+
+    Searches are run by SparsePathFinder, get_distance answers with a point to point search. It needs no NumPy.
+    """
+
+    def __init__(self, locations, offsets, targets, weights, reverse=None):
+        """
+        :param locations: a sequence of locations, the position of each location is its index
+        :param offsets: CSR row offsets, one more than there are locations
+        :param targets: CSR edge targets
+        :param weights: CSR edge weights
+        :param reverse: optional tuple of offsets, targets and weights of the reversed edges, None for an undirected
+        graph
+        """
+        self.locations = list(locations)
+        self.index = {location: i for i, location in enumerate(self.locations)}
+        if len(offsets) != len(self.locations) + 1 or len(targets) != len(weights):
+            raise ValueError(str('CSR arrays do not match %s locations' % len(self.locations)))
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.directed = reverse is not None
+        self.reverse = reverse if reverse is not None else (offsets, targets, weights)
+        self.coordinates = [getattr(location, 'coordinates', None) for location in self.locations]
+        self.heuristic_scale = self.admissible_scale()
+
+    @staticmethod
+    def compress(size, sources, targets, weights):
+        """
+        sorts edges by source into CSR arrays with a counting sort, O(V + E)
+        :return: a tuple of offsets, targets and weights arrays
+        """
+        offsets = array('q', [0]) * (size + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for i in range(size):
+            offsets[i + 1] += offsets[i]
+        position = array('q', offsets[:-1])
+        sorted_targets = array('l', [0]) * len(targets)
+        sorted_weights = array('d', [0]) * len(weights)
+        for source, target, weight in zip(sources, targets, weights):
+            edge = position[source]
+            sorted_targets[edge] = target
+            sorted_weights[edge] = weight
+            position[source] = edge + 1
+        return offsets, sorted_targets, sorted_weights
+
+    @classmethod
+    def from_edges(cls, locations, edges, directed=False):
+        """
+        :param locations: every location of the graph
+        :param edges: iterable of (origin, destination, distance), for an undirected graph each edge is given once
+        :param directed: whether edges only lead from origin to destination
+        :return: SparseGraph
+        """
+        locations = list(locations)
+        index = {location: i for i, location in enumerate(locations)}
+        sources = array('l')
+        targets = array('l')
+        weights = array('d')
+        for origin, destination, distance in edges:
+            if distance < 0:
+                raise ValueError(str('negative distance %s from %s to %s' % (distance, origin, destination)))
+            sources.append(index[origin])
+            targets.append(index[destination])
+            weights.append(distance)
+        reverse = None
+        if directed:
+            reverse = cls.compress(len(locations), targets, sources, weights)
+        else:
+            sources, targets = sources + targets, targets + sources
+            weights = weights + weights
+        return cls(locations, *cls.compress(len(locations), sources, targets, weights), reverse=reverse)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        builds a sparse graph from the locations and edge weights of a DestinationGraph
+        :param graph: the DestinationGraph to convert, its distances are symmetric
+        :return: SparseGraph
+        """
+        locations = list(graph.adjacency_list)
+        index = {location: i for i, location in enumerate(locations)}
+        edges = [(origin, destination, distance) for (origin, destination), distance in graph.edge_weights.items()
+                 if index[origin] < index[destination]]
+        return cls.from_edges(locations, edges)
+
+    def admissible_scale(self):
+        """
+        :return: the largest factor straight line distance can be multiplied by without exceeding any edge's distance,
+        which makes the A* heuristic consistent, 0 if a location has no coordinates
+        """
+        if not self.coordinates or any(coordinates is None for coordinates in self.coordinates):
+            return 0
+        scale = math.inf
+        coordinates = self.coordinates
+        for source in range(len(self.locations)):
+            x, y = coordinates[source]
+            for edge in range(self.offsets[source], self.offsets[source + 1]):
+                straight = math.hypot(x - coordinates[self.targets[edge]][0], y - coordinates[self.targets[edge]][1])
+                if straight > 0:
+                    scale = min(scale, self.weights[edge] / straight)
+        return 1 if scale == math.inf else scale
+
+    def index_of(self, location):
+        return self.index[location]
+
+    def location_at(self, i):
+        return self.locations[i]
+
+    def edges(self, i):
+        """
+        :param i: location index
+        :return: a list of (target index, weight) of the edges leaving location i
+        """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.targets[start:end], self.weights[start:end]))
+
+    def edge_count(self):
+        """
+        :return: number of stored edges, an undirected edge counts once per direction
+        """
+        return len(self.targets)
+
+    def get_distance(self, l1, l2):
+        """
+        shortest path distance between two locations, with A* when there are coordinates and bidirectional Dijkstra
+        otherwise
+        :return: distance, infinity if l2 cannot be reached
+        """
+        from SparsePathFinder import SparsePathFinder
+        method = 'astar' if self.heuristic_scale else 'bidirectional'
+        return SparsePathFinder(self, l1, method=method).calculate_path(l2)[1]
+
+    def nbytes(self):
+        """
+        :return: bytes held by the CSR arrays, including the reverse arrays of a directed graph
+        """
+        arrays = [self.offsets, self.targets, self.weights]
+        if self.directed:
+            arrays.extend(self.reverse)
+        return sum(len(values) * values.itemsize for values in arrays)
+
+    def __len__(self):
+        return len(self.locations)
@@ -0,0 +1,253 @@
+import heapq
+import math
+from MetricsRegistry import metrics
+from PathFinderAlgorithm import PathFinderAlgorithm
+from SparseGraph import SparseGraph
+
+
+class SparsePathFinder(PathFinderAlgorithm):
+    """
+    Shortest paths on a SparseGraph, with the PathFinderAlgorithm interface
+
+    method picks the search:
+        'dijkstra'      one search from start_location, like PathFinderAlgorithm. It stops once every one of locations
+                        is settled or builds the full shortest path tree without them
+        'bidirectional' one search per target, run from start_location and from the target at once until the two
+                        frontiers meet. Each side only has to cover about half the distance, so on a road network it
+                        settles far fewer locations than a one sided search
+        'astar'         one search per target, guided towards it by straight line distance. Needs coordinates on every
+                        location and falls back to 'bidirectional' when they are missing
+    The point to point methods search for every one of locations up front and for any other target the first time
+    calculate_path asks for it.
+
+    All searches work on integer indices and the CSR arrays of the graph, distances and predecessors are filled in for
+    the locations on the paths found so they can be read like those of PathFinderAlgorithm. A DestinationGraph is
+    converted with its get_sparse_graph().
+    """
+
+    METHODS = ('dijkstra', 'bidirectional', 'astar')
+
+    def __init__(self, graph, start_location, locations=None, method='dijkstra'):
+        """
+        :param graph: a SparseGraph, or a DestinationGraph which is converted
+        :param start_location: starting location used to calculate the distance to
+        :param locations: an optional subset of the locations inside of the graph to search for
+        :param method: 'dijkstra', 'bidirectional' or 'astar'
+        """
+        if method not in self.METHODS:
+            raise ValueError(str('unknown search method %s' % method))
+        if not isinstance(graph, SparseGraph):
+            graph = graph.get_sparse_graph()
+        if method == 'astar' and not graph.heuristic_scale:
+            method = 'bidirectional'
+        self.graph = graph
+        self.method = method
+        self.start_location = start_location
+        self.source = graph.index_of(start_location)
+        self.distances = {start_location: 0}
+        self.predecessors = {start_location: None}
+        self.settled = {start_location}
+        # locations settled over all searches, for comparing methods
+        self.settled_count = 0
+        if method == 'dijkstra':
+            targets = {graph.index_of(location) for location in locations} if locations else set()
+            self.dijkstra(targets)
+        elif locations:
+            for location in locations:
+                self.search(location)
+
+    def dijkstra(self, targets):
+        """
+        one to many search from source on index arrays, stops once every one of targets is settled
+        :param targets: set of target indices, empty to search the whole graph
+        :return: None
+        """
+        offsets, edge_targets, weights = self.graph.offsets, self.graph.targets, self.graph.weights
+        targets = set(targets)
+        targets.discard(self.source)
+        distances = {self.source: 0}
+        predecessors = {self.source: -1}
+        settled = set()
+        # indices are integers, so equal distances are ordered by index without a tie breaker
+        heap = [(0, self.source)]
+        while heap:
+            distance, current = heapq.heappop(heap)
+            if current in settled:
+                continue
+            settled.add(current)
+            if targets:
+                targets.discard(current)
+                if not targets:
+                    break
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbour = edge_targets[edge]
+                if neighbour in settled:
+                    continue
+                total_distance = distance + weights[edge]
+                if total_distance < distances.get(neighbour, math.inf):
+                    distances[neighbour] = total_distance
+                    predecessors[neighbour] = current
+                    heapq.heappush(heap, (total_distance, neighbour))
+        self.record(len(settled))
+        location_at = self.graph.location_at
+        self.distances = {location_at(i): distance for i, distance in distances.items()}
+        self.predecessors = {location_at(i): location_at(p) if p >= 0 else None for i, p in predecessors.items()}
+        self.settled = {location_at(i) for i in settled}
+
+    def bidirectional(self, target):
+        """
+        point to point search from source and target at once
+        the side with the closer frontier is expanded next, the search ends once the two closest frontier distances
+        add up to at least the shortest connection found so far
+        :param target: target index
+        :return: a tuple of the distance and the path as a list of indices, (infinity, []) if target cannot be reached
+        """
+        if target == self.source:
+            return 0, [target]
+        graphs = ((self.graph.offsets, self.graph.targets, self.graph.weights), self.graph.reverse)
+        distances = ({self.source: 0}, {target: 0})
+        predecessors = ({self.source: -1}, {target: -1})
+        settled = (set(), set())
+        heaps = ([(0, self.source)], [(0, target)])
+        shortest = math.inf
+        meeting = None
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= shortest:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            distance, current = heapq.heappop(heaps[side])
+            if current in settled[side]:
+                continue
+            settled[side].add(current)
+            offsets, edge_targets, weights = graphs[side]
+            own, other = distances[side], distances[1 - side]
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbour = edge_targets[edge]
+                total_distance = distance + weights[edge]
+                if total_distance < own.get(neighbour, math.inf):
+                    own[neighbour] = total_distance
+                    predecessors[side][neighbour] = current
+                    heapq.heappush(heaps[side], (total_distance, neighbour))
+                if neighbour in other and total_distance + other[neighbour] < shortest:
+                    shortest = total_distance + other[neighbour]
+                    meeting = neighbour
+        self.record(len(settled[0]) + len(settled[1]))
+        if meeting is None:
+            return math.inf, []
+        path = self.walk(predecessors[0], meeting)
+        path.reverse()
+        path.extend(self.walk(predecessors[1], meeting)[1:])
+        return shortest, path
+
+    def astar(self, target):
+        """
+        point to point search ordered by distance so far plus the scaled straight line distance to target
+        the heuristic is consistent, so a location's distance is final once it is settled, like in Dijkstra
+        :param target: target index
+        :return: a tuple of the distance and the path as a list of indices, (infinity, []) if target cannot be reached
+        """
+        offsets, edge_targets, weights = self.graph.offsets, self.graph.targets, self.graph.weights
+        coordinates = self.graph.coordinates
+        scale = self.graph.heuristic_scale
+        target_x, target_y = coordinates[target]
+
+        def estimate(i):
+            x, y = coordinates[i]
+            return scale * math.hypot(x - target_x, y - target_y)
+        distances = {self.source: 0}
+        predecessors = {self.source: -1}
+        settled = set()
+        heap = [(estimate(self.source), 0, self.source)]
+        while heap:
+            _, distance, current = heapq.heappop(heap)
+            if current in settled:
+                continue
+            settled.add(current)
+            if current == target:
+                break
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbour = edge_targets[edge]
+                if neighbour in settled:
+                    continue
+                total_distance = distance + weights[edge]
+                if total_distance < distances.get(neighbour, math.inf):
+                    distances[neighbour] = total_distance
+                    predecessors[neighbour] = current
+                    heapq.heappush(heap, (total_distance + estimate(neighbour), total_distance, neighbour))
+        self.record(len(settled))
+        if target not in settled:
+            return math.inf, []
+        path = self.walk(predecessors, target)
+        path.reverse()
+        return distances[target], path
+
+    @staticmethod
+    def walk(predecessors, i):
+        """
+        :return: the indices from i back to the start of its search
+        """
+        path = []
+        while i >= 0:
+            path.append(i)
+            i = predecessors[i]
+        return path
+
+    def record(self, settled):
+        self.settled_count += settled
+        if metrics.enabled:
+            metrics.increment('pathfinder_runs_total')
+            metrics.observe('pathfinder_settled_locations', settled)
+
+    def search(self, end_location):
+        """
+        runs the point to point search for end_location and stores the path found in distances and predecessors,
+        every location on a shortest path is reached by the shortest path to it
+        :return: None
+        """
+        search = self.astar if self.method == 'astar' else self.bidirectional
+        distance, path = search(self.graph.index_of(end_location))
+        if not path:
+            return
+        location_at = self.graph.location_at
+        previous = None
+        travelled = 0
+        for i in path:
+            location = location_at(i)
+            if previous is not None:
+                travelled += self.edge_weight(self.graph.index_of(previous), i)
+            if location not in self.distances or travelled < self.distances[location]:
+                self.distances[location] = travelled
+                self.predecessors[location] = previous
+            self.settled.add(location)
+            previous = location
+
+    def edge_weight(self, origin, destination):
+        offsets = self.graph.offsets
+        weights = self.graph.weights
+        return min(weights[edge] for edge in range(offsets[origin], offsets[origin + 1])
+                   if self.graph.targets[edge] == destination)
+
+    def get_shortest_path_tree(self):
+        """
+        :return: a dict of each settled location to its predecessor, for the point to point methods only the locations
+        on the paths searched so far
+        """
+        return {location: self.predecessors[location] for location in self.settled}
+
+    def calculate_path(self, end_location):
+        """
+        :param end_location: the end location to find the shortest distance to
+        :return: a tuple of the path from the start location to end_location and its total distance, ([], infinity)
+        if end_location cannot be reached
+        """
+        if end_location not in self.settled and self.method != 'dijkstra':
+            self.search(end_location)
+        if end_location not in self.settled:
+            return [], math.inf
+        calculated_path = []
+        current_location = end_location
+        while current_location is not None:
+            calculated_path.append(current_location)
+            current_location = self.predecessors[current_location]
+        calculated_path.reverse()
+        return calculated_path, self.distances[end_location]
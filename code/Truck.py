@@ -1,4 +1,5 @@
 from DestinationGraph import Location
+from MetricsRegistry import metrics
 import copy
 
 
@@ -6,6 +7,8 @@ class Truck:
     def __init__(self, name, hub_location, time_keeper):
         self.name = name
         self.packages = set()
+        # packages on board grouped by destination, a stop only touches its own bucket
+        self.stops = {}
         self.package_limit = 16
         self.distance_from_hub = 0
         self.current_location = hub_location
@@ -25,30 +28,50 @@ class Truck:
         """
         self.distance_traveled_on_trip = 0
         self.current_location = self.hub_location
-        new_packages = set(new_packages[0])
+        new_packages = set(new_packages[0]).difference(self.packages)
+        if len(self.packages) + len(new_packages) > self.package_limit:
+            raise Exception(str('not enough capacity in truck. Tried %s , capacity is %s   %s' % (
+                len(self.packages) + len(new_packages), self.package_limit, self.name)))
         for new_package in new_packages:
             new_package.set_in_transit(self.internal_timeline.current_time)
-        if len(self.packages) + len(new_packages) <= self.package_limit:
-            self.packages = self.packages.union(new_packages)
-            self.last_delivery_size = len(self.packages)
-            return
-        raise Exception(str('not enough capacity in truck. Tried %s , capacity is %s   %s' % (
-            len(self.packages) + len(new_packages), self.package_limit, self.name)))
+            self.stops.setdefault(new_package.location, set()).add(new_package)
+        self.packages.update(new_packages)
+        self.last_delivery_size = len(self.packages)
 
     def deliver_package(self):
         """
         delivers packages
-        finds packages that are local to trucks current location
+        takes the bucket of packages for the trucks current location, O(k) for the k packages delivered there
         sets package status to delivered
         :return: None
         """
-        local_packages = set(filter(lambda x: x.location is self.current_location, self.packages))
+        local_packages = self.stops.pop(self.current_location, ())
         for package in local_packages:
             package.set_delivered(self.internal_timeline.current_time)
             package.set_truck(self.name)
-        self.packages = self.packages - local_packages
+        self.packages.difference_update(local_packages)
+        if metrics.enabled:
+            metrics.increment('truck_stops_total')
+            metrics.increment('truck_deliveries_total', len(local_packages))
+            metrics.observe('truck_packages_per_stop', len(local_packages))
         # print(str('delivering %s packages' % (len(local_packages)) ))
 
+    def move_package(self, package, location):
+        """
+        moves a package on board to the bucket of location, for a delivery address changed while the truck is out
+        package.location is left to the caller
+        :param package: package on the truck
+        :param location: location the package is now delivered at
+        :return: None
+        """
+        bucket = self.stops.get(package.location)
+        if bucket is None or package not in bucket:
+            raise ValueError(str('package %s is not on %s' % (package.id, self.name)))
+        bucket.discard(package)
+        if not bucket:
+            del self.stops[package.location]
+        self.stops.setdefault(location, set()).add(package)
+
     def travel_to_location(self, next_location, travel_distance):
         """
         totals the distance traveled on trip for statistic use
@@ -100,6 +123,18 @@ class Truck:
         """
         return list(self.packages)
 
+    def get_package_count(self):
+        """
+        :return: number of packages on the truck, without copying them like get_packages
+        """
+        return len(self.packages)
+
+    def get_stop_count(self):
+        """
+        :return: number of locations the truck still has packages for
+        """
+        return len(self.stops)
+
     def get_total_distance(self):
         """
         :return: total distance traveled by truck
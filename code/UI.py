@@ -1,13 +1,19 @@
 from datetime import datetime
 from datetime import date
+from DeliveryLog import DeliveryLog
 from HashTable import HashTable
-from Package import Package
+from Package import PackageStatus
 from Truck import Truck
 
 
 class UI:
-    def __init__(self, package_table: HashTable, first_truck: Truck, second_truck: Truck):
+    def __init__(self, package_table: HashTable, first_truck: Truck, second_truck: Truck,
+                 delivery_log: DeliveryLog = None):
         self.package_table = package_table
+        # status by time is answered from the log, built from the packages' timestamps if none is given
+        if delivery_log is None:
+            delivery_log = DeliveryLog.from_packages(package_table.get_all_packages())
+        self.delivery_log = delivery_log
         self.first_truck = first_truck
         self.second_truck = second_truck
         self.menu = "Welcome to WGUPS\n" \
@@ -42,17 +48,19 @@ class UI:
                         print('Enter \'menu\' to return to main menu')
                 if parsed_time is None:
                     continue
-                packages = self.package_table.get_all_packages()
-                for package in packages:
-                    package: Package
-                    if package.transit_time > parsed_time and package.delivery_time > parsed_time:
+                statuses = self.delivery_log.snapshot(parsed_time)
+                for package in sorted(self.package_table.get_all_packages(), key=lambda p: p.id):
+                    status, status_time = statuses.get(package.id, (None, None))
+                    if status is PackageStatus.AT_HUB:
                         status_message = str(
-                            '\tStatus: Arrived at the hub at: %s' % package.hub_time.strftime('%H:%M%p'))
-                    elif package.delivery_time > parsed_time > package.transit_time:
+                            '\tStatus: Arrived at the hub at: %s' % status_time.strftime('%H:%M%p'))
+                    elif status is PackageStatus.IN_TRANSIT:
                         status_message = str(
-                            '\tStatus: In transit for delivery. Departed Hub at: %s' % package.transit_time.strftime('%H:%M%p'))
-                    else:
+                            '\tStatus: In transit for delivery. Departed Hub at: %s' % status_time.strftime('%H:%M%p'))
+                    elif status is PackageStatus.DELIVERED:
                         status_message = str('\tStatus: Delivered at: %s by %s'
-                                             % (package.delivery_time.strftime('%H:%M%p'), package.truck))
+                                             % (status_time.strftime('%H:%M%p'), package.truck))
+                    else:
+                        status_message = str('\tStatus: Not yet at the hub')
                     print('Package ID: %s %s' % (package.id, status_message))
 